@@ -0,0 +1,94 @@
+"""Compare the token-budget chunker with the legacy character splitter.
+
+Run from the backend directory:
+
+    python -m benchmarks.chunking --paragraphs 5000 --budget 1000
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from src.chunking import TokenChunker, TokenCounter
+
+SPANISH_WORDS = (
+    "la de que el en y los del se las por un para con una su al lo como más "
+    "pero sus le ya o este porque esta entre cuando muy sin sobre también me "
+    "hasta hay donde quien desde todo nos durante todos uno les ni contra "
+    "otros ese eso ante ellos esto antes algunos unos otro otras otra tanto "
+    "aprendizaje estudiante conocimiento universidad investigación análisis"
+).split()
+
+ENGLISH_WORDS = (
+    "the of and to in is that for it as was with be by on not he this are or "
+    "his from at which but have an they you were her she there been one all "
+    "would their we him has when who will more no if out so said what up its "
+    "learning student knowledge university research analysis"
+).split()
+
+
+def build_text(paragraphs: int, seed: int = 7) -> str:
+    """Mixed Spanish/English text with paragraphs of varying length."""
+    rng = random.Random(seed)
+    parts = []
+    for index in range(paragraphs):
+        words = SPANISH_WORDS if index % 2 == 0 else ENGLISH_WORDS
+        sentences = []
+        for _ in range(rng.randint(1, 12)):
+            sentence = " ".join(rng.choice(words) for _ in range(rng.randint(6, 30)))
+            sentences.append(sentence.capitalize() + ".")
+        parts.append(" ".join(sentences))
+    return "\n\n".join(parts)
+
+
+def describe(name: str, chunks, counter: TokenCounter, budget: int, seconds: float):
+    tokens = [counter.count(chunk) for chunk in chunks]
+    print(
+        f"{name:<12} chunks={len(chunks):>6} time={seconds * 1000:>9.1f}ms "
+        f"tokens/chunk mean={statistics.mean(tokens):>7.1f} "
+        f"stdev={statistics.pstdev(tokens):>6.1f} max={max(tokens):>6} "
+        f"fill={statistics.mean(tokens) / budget:>5.1%} total={sum(tokens)}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--paragraphs", type=int, default=5000)
+    parser.add_argument("--budget", type=int, default=1000)
+    parser.add_argument("--chunk-size", type=int, default=4000)
+    parser.add_argument("--model", default="openai/gpt-4o-mini")
+    args = parser.parse_args()
+
+    text = build_text(args.paragraphs)
+    print(f"Input: {len(text):,} characters, {args.paragraphs:,} paragraphs")
+
+    # Separate counters so the legacy run does not warm the token cache
+    counter = TokenCounter(args.model)
+    started = time.perf_counter()
+    character_chunks = RecursiveCharacterTextSplitter(
+        chunk_size=args.chunk_size, chunk_overlap=200, length_function=len
+    ).split_text(text)
+    character_seconds = time.perf_counter() - started
+
+    token_counter = TokenCounter(args.model)
+    # The encoding loads on first use; keep that out of the timing
+    token_counter.count("")
+    token_chunker = TokenChunker(token_counter, max_tokens=args.budget)
+    started = time.perf_counter()
+    token_chunks = token_chunker.split_text(text)
+    token_seconds = time.perf_counter() - started
+
+    describe("characters", character_chunks, counter, args.budget, character_seconds)
+    describe("tokens", token_chunks, counter, args.budget, token_seconds)
+
+    # A second pass over the same text shows the per-segment count cache
+    started = time.perf_counter()
+    token_chunker.split_text(text)
+    print(f"tokens (warm cache) time={(time.perf_counter() - started) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Synthetic PDF corpus with varied page counts and text density.
+
+The PDFs are written by hand (one Helvetica text object per page) so the
+benchmarks need nothing beyond the app's own dependencies.
+"""
+
+import random
+from typing import List
+
+from .chunking import ENGLISH_WORDS, SPANISH_WORDS
+
+# Characters per line that still fit a Letter page at 10pt Helvetica
+LINE_WIDTH = 95
+MAX_LINES_PER_PAGE = 58
+
+
+def escape_pdf_text(text: str) -> bytes:
+    escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return escaped.encode("cp1252", errors="replace")
+
+
+def page_content_stream(lines: List[str]) -> bytes:
+    parts = [b"BT /F1 10 Tf 12 TL 50 750 Td"]
+    for line in lines:
+        parts.append(b"(" + escape_pdf_text(line) + b") Tj T*")
+    parts.append(b"ET")
+    return b"\n".join(parts)
+
+
+def build_pdf(pages: List[List[str]]) -> bytes:
+    """Serialize pages of text lines into a minimal, valid PDF file."""
+    font = (
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica "
+        b"/Encoding /WinAnsiEncoding >>"
+    )
+    kids = " ".join(f"{4 + 2 * index} 0 R" for index in range(len(pages)))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode("ascii"),
+        font,
+    ]
+    for index, lines in enumerate(pages):
+        stream = page_content_stream(lines)
+        objects.append(
+            (
+                "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                "/Resources << /Font << /F1 3 0 R >> >> "
+                f"/Contents {5 + 2 * index} 0 R >>"
+            ).encode("ascii")
+        )
+        objects.append(
+            b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        )
+
+    output = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+
+    xref_offset = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(objects) + 1,
+        xref_offset,
+    )
+    return bytes(output)
+
+
+def generate_lines(rng: random.Random, count: int) -> List[str]:
+    """Sentence-like lines alternating Spanish and English paragraphs."""
+    lines = []
+    words = SPANISH_WORDS
+    line = ""
+    while len(lines) < count:
+        if rng.random() < 0.05:
+            # Paragraph break, possibly switching language
+            words = rng.choice((SPANISH_WORDS, ENGLISH_WORDS))
+            if line:
+                lines.append(line)
+            line = ""
+            continue
+        word = rng.choice(words)
+        if rng.random() < 0.08:
+            word += "."
+        if len(line) + len(word) + 1 > LINE_WIDTH:
+            lines.append(line)
+            line = word.capitalize()
+        else:
+            line = f"{line} {word}" if line else word.capitalize()
+    return lines[:count]
+
+
+def generate_document(rng: random.Random, pages: int, lines_per_page: int) -> bytes:
+    lines_per_page = max(1, min(lines_per_page, MAX_LINES_PER_PAGE))
+    return build_pdf([generate_lines(rng, lines_per_page) for _ in range(pages)])
+
+
+def generate_corpus(
+    count: int,
+    seed: int = 7,
+    min_pages: int = 1,
+    max_pages: int = 40,
+    min_lines: int = 8,
+    max_lines: int = MAX_LINES_PER_PAGE,
+) -> List[dict]:
+    """Build ``count`` PDFs whose size and density vary deterministically."""
+    rng = random.Random(seed)
+    corpus = []
+    for index in range(count):
+        pages = rng.randint(min_pages, max_pages)
+        lines_per_page = rng.randint(min_lines, max_lines)
+        corpus.append(
+            {
+                "filename": f"synthetic-{index:04d}.pdf",
+                "pages": pages,
+                "lines_per_page": lines_per_page,
+                "data": generate_document(rng, pages, lines_per_page),
+            }
+        )
+    return corpus
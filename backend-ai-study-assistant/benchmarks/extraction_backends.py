@@ -0,0 +1,124 @@
+"""Compare PDF extraction backends on the same synthetic corpus.
+
+Each installed backend streams every page of the corpus in a fresh process,
+so its peak memory is measured on its own. Run from the backend directory:
+
+    python -m benchmarks.extraction_backends --documents 20 --max-pages 60
+    python -m benchmarks.extraction_backends --backends pypdf2,pypdfium2
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from typing import List
+
+from src.extraction import BACKENDS
+
+from .corpus import generate_corpus
+from .memory import max_rss_bytes
+
+
+def peak_rss_mb() -> float:
+    return max_rss_bytes() / (1024 * 1024)
+
+
+def run_backend(name: str, paths: List[str], results) -> None:
+    """Stream every page of ``paths`` with one backend, in a child process."""
+    backend = BACKENDS[name]
+    # Import the backend before taking the baseline so only extraction counts
+    backend.page_count(paths[0])
+    baseline_mb = peak_rss_mb()
+
+    pages = characters = 0
+    started = time.perf_counter()
+    for path in paths:
+        for text in backend.iter_pages(path, range(backend.page_count(path))):
+            pages += 1
+            characters += len(text)
+    seconds = time.perf_counter() - started
+
+    results.put(
+        {
+            "backend": name,
+            "pages": pages,
+            "characters": characters,
+            "seconds": round(seconds, 3),
+            "pages_per_second": round(pages / seconds, 1) if seconds else 0.0,
+            "baseline_rss_mb": round(baseline_mb, 1),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "extraction_rss_mb": round(peak_rss_mb() - baseline_mb, 1),
+        }
+    )
+
+
+def measure(name: str, paths: List[str]) -> dict:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(target=run_backend, args=(name, paths, results))
+    process.start()
+    process.join()
+    if process.exitcode != 0:
+        return {"backend": name, "error": f"exit code {process.exitcode}"}
+    return results.get()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=20)
+    parser.add_argument("--min-pages", type=int, default=5)
+    parser.add_argument("--max-pages", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument(
+        "--backends",
+        default="all",
+        help="comma-separated backend names (default: every installed one)",
+    )
+    parser.add_argument("--output", help="write the JSON results to this path")
+    args = parser.parse_args()
+
+    names = list(BACKENDS) if args.backends == "all" else args.backends.split(",")
+    installed = [name for name in names if BACKENDS[name].available()]
+    for name in sorted(set(names) - set(installed)):
+        print(f"{name:<10} not installed, skipped")
+
+    corpus = generate_corpus(args.documents, args.seed, args.min_pages, args.max_pages)
+    directory = tempfile.mkdtemp(prefix="extraction-benchmark-")
+    paths = []
+    for document in corpus:
+        path = os.path.join(directory, document["filename"])
+        with open(path, "wb") as output:
+            output.write(document["data"])
+        paths.append(path)
+    total_pages = sum(document["pages"] for document in corpus)
+    print(f"Corpus: {len(corpus)} PDFs, {total_pages} pages")
+
+    results = []
+    for name in installed:
+        result = measure(name, paths)
+        results.append(result)
+        if "error" in result:
+            print(f"{name:<10} failed: {result['error']}")
+            continue
+        print(
+            f"{name:<10} pages/s={result['pages_per_second']:>8.1f} "
+            f"time={result['seconds']:>7.2f}s chars={result['characters']:>10,} "
+            f"extraction rss={result['extraction_rss_mb']:>6.1f}MB "
+            f"peak rss={result['peak_rss_mb']:>6.1f}MB"
+        )
+
+    for path in paths:
+        os.remove(path)
+    os.rmdir(directory)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            report = {"corpus_pages": total_pages, "results": results}
+            json.dump(report, output, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
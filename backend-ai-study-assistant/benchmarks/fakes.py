@@ -0,0 +1,229 @@
+"""Stand-ins for OpenRouter and the job store used by the pipeline benchmark."""
+
+import asyncio
+import copy
+import hashlib
+import json
+import random
+import re
+from typing import List, Optional
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, LLMResult
+
+from src.storage import JobNotFoundError, JobStore
+
+WORD_PATTERN = re.compile(r"[^\W\d_]{4,}", re.UNICODE)
+ARTIFACT_KEYS = ("bullet_points", "quiz_questions", "flashcards")
+DEFAULT_COUNTS = {"bullet_points": 40, "quiz_questions": 20, "flashcards": 15}
+
+
+class FakeLLM:
+    """Deterministic chat model that answers every prompt with valid JSON.
+
+    Replies depend only on the prompts, so repeated runs produce the same
+    output. ``latency`` is the delay before the first token and
+    ``chars_per_second`` paces the rest, for both agenerate and astream.
+    """
+
+    def __init__(
+        self,
+        latency: float = 0.5,
+        chars_per_second: float = 4000.0,
+        stream_pieces: int = 20,
+        temperature: float = 0.0,
+    ):
+        self.latency = latency
+        self.chars_per_second = chars_per_second
+        self.stream_pieces = max(1, stream_pieces)
+        self.temperature = temperature
+        self.calls = 0
+
+    def reply(self, system_prompt: str, human_prompt: str) -> str:
+        rng = random.Random(
+            hashlib.sha256((system_prompt + human_prompt).encode("utf-8")).digest()
+        )
+        vocabulary = WORD_PATTERN.findall(human_prompt)[:5000] or ["contenido"]
+
+        def phrase(words: int) -> str:
+            return " ".join(rng.choice(vocabulary) for _ in range(words))
+
+        counts = requested_counts(system_prompt)
+        payload = {}
+        if "bullet_points" in counts:
+            payload["bullet_points"] = [
+                {
+                    "point": phrase(rng.randint(8, 20)).capitalize() + ".",
+                    "importance_level": rng.choice(("high", "medium", "low")),
+                }
+                for _ in range(counts["bullet_points"])
+            ]
+        if "quiz_questions" in counts:
+            payload["quiz_questions"] = [
+                {
+                    "question": phrase(rng.randint(6, 14)).capitalize() + "?",
+                    "option_a": phrase(4),
+                    "option_b": phrase(4),
+                    "option_c": phrase(4),
+                    "option_d": phrase(4),
+                    "correct_answer": rng.choice("ABCD"),
+                    "explanation": phrase(rng.randint(10, 25)).capitalize() + ".",
+                }
+                for _ in range(counts["quiz_questions"])
+            ]
+        if "flashcards" in counts:
+            payload["flashcards"] = [
+                {
+                    "front": phrase(rng.randint(2, 6)).capitalize() + "?",
+                    "back": phrase(rng.randint(8, 20)).capitalize() + ".",
+                    "category": phrase(1).capitalize(),
+                }
+                for _ in range(counts["flashcards"])
+            ]
+        return "```json\n" + json.dumps(payload, ensure_ascii=False) + "\n```"
+
+    @staticmethod
+    def usage(system_prompt: str, human_prompt: str, text: str) -> dict:
+        prompt_tokens = (len(system_prompt) + len(human_prompt)) // 4
+        completion_tokens = len(text) // 4
+        return {
+            "input_tokens": prompt_tokens,
+            "output_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+    async def agenerate(self, batches: List[list]) -> LLMResult:
+        self.calls += 1
+        system_prompt, human_prompt = (message.content for message in batches[0])
+        text = self.reply(system_prompt, human_prompt)
+        await asyncio.sleep(self.latency + len(text) / self.chars_per_second)
+
+        usage = self.usage(system_prompt, human_prompt, text)
+        token_usage = {
+            "prompt_tokens": usage["input_tokens"],
+            "completion_tokens": usage["output_tokens"],
+            "total_tokens": usage["total_tokens"],
+        }
+        return LLMResult(
+            generations=[[ChatGeneration(message=AIMessage(content=text))]],
+            llm_output={"token_usage": token_usage},
+        )
+
+    async def astream(self, messages: list):
+        self.calls += 1
+        system_prompt, human_prompt = (message.content for message in messages)
+        text = self.reply(system_prompt, human_prompt)
+        await asyncio.sleep(self.latency)
+
+        piece_size = max(1, -(-len(text) // self.stream_pieces))
+        for start in range(0, len(text), piece_size):
+            piece = text[start : start + piece_size]
+            await asyncio.sleep(len(piece) / self.chars_per_second)
+            yield AIMessageChunk(content=piece)
+        yield AIMessageChunk(
+            content="", usage_metadata=self.usage(system_prompt, human_prompt, text)
+        )
+
+
+def requested_counts(system_prompt: str) -> dict:
+    """Which artifacts a prompt asks for, and roughly how many of each."""
+    artifacts = [key for key in ARTIFACT_KEYS if f'"{key}"' in system_prompt]
+    section_count = re.search(r"Create about (\d+) items", system_prompt)
+    counts = {}
+    for artifact in artifacts:
+        if section_count and len(artifacts) == 1:
+            counts[artifact] = int(section_count.group(1))
+        else:
+            counts[artifact] = DEFAULT_COUNTS[artifact]
+    at_least = re.findall(r"Create at least (\d+)", system_prompt)
+    if len(artifacts) == len(at_least) == len(ARTIFACT_KEYS):
+        # Combined prompt: one "at least" per artifact, in declaration order
+        counts = {
+            artifact: int(count) for artifact, count in zip(ARTIFACT_KEYS, at_least)
+        }
+    return counts
+
+
+class InMemoryJobStore(JobStore):
+    """Dict-backed job store standing in for Firestore.
+
+    ``latency`` simulates one storage round trip per call. Documents are
+    copied in and out so callers never share state with the store.
+    """
+
+    name = "memory"
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.documents = {}
+        self.results = {}
+        self.round_trips = 0
+
+    async def _round_trip(self) -> None:
+        self.round_trips += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def create(self, doc_data: dict, result_blobs: Optional[dict] = None):
+        await self._round_trip()
+        self.documents[doc_data["uuid"]] = copy.deepcopy(doc_data)
+        if result_blobs:
+            self.results[doc_data["uuid"]] = dict(result_blobs)
+
+    async def update(
+        self, doc_uuid: str, update_data: dict, result_blobs: Optional[dict] = None
+    ):
+        await self._round_trip()
+        if doc_uuid not in self.documents:
+            raise JobNotFoundError(doc_uuid)
+        self.documents[doc_uuid].update(copy.deepcopy(update_data))
+        if result_blobs:
+            self.results.setdefault(doc_uuid, {}).update(result_blobs)
+
+    async def put_results(self, doc_uuid: str, result_blobs: dict):
+        await self._round_trip()
+        self.results.setdefault(doc_uuid, {}).update(result_blobs)
+
+    async def get(self, doc_uuid: str) -> Optional[dict]:
+        await self._round_trip()
+        return copy.deepcopy(self.documents.get(doc_uuid))
+
+    async def get_results(self, doc_uuid: str, artifacts: List[str]) -> dict:
+        await self._round_trip()
+        blobs = self.results.get(doc_uuid, {})
+        return {artifact: blobs.get(artifact) for artifact in artifacts}
+
+    async def delete(self, doc_uuid: str) -> bool:
+        await self._round_trip()
+        self.results.pop(doc_uuid, None)
+        return self.documents.pop(doc_uuid, None) is not None
+
+    async def list(
+        self,
+        fields: List[str],
+        status: Optional[str],
+        limit: int,
+        start_after: Optional[dict] = None,
+    ) -> List[dict]:
+        await self._round_trip()
+        documents = sorted(
+            self.documents.values(),
+            key=lambda doc: (doc["created_at"], doc["uuid"]),
+            reverse=True,
+        )
+        if status:
+            documents = [doc for doc in documents if doc["status"] == status]
+        if start_after:
+            position = (start_after["created_at"], start_after["uuid"])
+            documents = [
+                doc for doc in documents if (doc["created_at"], doc["uuid"]) < position
+            ]
+        return [
+            {field: copy.deepcopy(doc.get(field)) for field in fields}
+            for doc in documents[:limit]
+        ]
+
+    def wrap(self, wrapper) -> None:
+        """Route every storage call of this store through ``wrapper``."""
+        for name in ("create", "update", "get", "get_results", "delete", "list"):
+            setattr(self, name, wrapper(getattr(self, name)))
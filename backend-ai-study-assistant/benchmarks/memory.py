@@ -0,0 +1,11 @@
+"""Peak memory readings shared by the benchmarks."""
+
+import resource
+import sys
+
+
+def max_rss_bytes(who: int = resource.RUSAGE_SELF) -> int:
+    """Peak resident set size of this process, or of its reaped children."""
+    peak = resource.getrusage(who).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
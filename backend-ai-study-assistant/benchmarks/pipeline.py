@@ -0,0 +1,417 @@
+"""End-to-end benchmark of process_pdfs_background without external services.
+
+A synthetic PDF corpus goes through the real scheduler, extraction,
+chunking, selection and generation code. The LLM is replaced by a
+deterministic fake and Firestore by an in-memory store. Run from the
+backend directory:
+
+    python -m benchmarks.pipeline --jobs 24 --concurrency 4 --output run.json
+    python -m benchmarks.pipeline --compare run.json --output new.json
+
+Per-stage timings are the wall time each stage occupied within a job.
+Overlapping calls, such as the three concurrent generators, are merged
+rather than summed.
+"""
+
+import argparse
+import asyncio
+import contextvars
+import functools
+import hashlib
+import importlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime
+from typing import Dict, List
+
+from src.chunking import ChunkStream
+from src.dedup import Deduplicator
+
+from .corpus import generate_corpus
+from .fakes import FakeLLM, InMemoryJobStore
+from .memory import max_rss_bytes
+
+STAGES = ("extraction", "dedup", "chunking", "selection", "generation", "persistence")
+# Metrics where a higher value is better; everything else regresses upwards
+HIGHER_IS_BETTER = {"jobs_per_second"}
+# Metrics where any increase is a regression, whatever the threshold
+NO_INCREASE = {"jobs_failed"}
+
+current_job = contextvars.ContextVar("current_job", default=None)
+
+
+def configure_environment(args) -> None:
+    """Settings the app reads at import time; real values always win."""
+    defaults = {
+        "OPENROUTER_API_KEY": "benchmark",
+        # Replaced by an in-memory store once the app is imported
+        "STORAGE_BACKEND": "sqlite",
+        "SQLITE_PATH": os.path.join(
+            tempfile.mkdtemp(prefix="pipeline-benchmark-db-"), "jobs.db"
+        ),
+        "JOB_WORKERS": str(args.concurrency),
+        "JOB_QUEUE_MAX": str(max(32, args.concurrency)),
+        # Every run must reach the fake LLM instead of a cached reply
+        "LLM_CACHE_PATH": "",
+        "LLM_CACHE_MEMORY_ENTRIES": "0",
+        "UPLOAD_SPOOL_DIR": tempfile.mkdtemp(prefix="pipeline-benchmark-"),
+    }
+    for name, value in defaults.items():
+        os.environ.setdefault(name, value)
+
+
+class StageRecorder:
+    """Collects (start, end) intervals per job and stage."""
+
+    def __init__(self):
+        self.intervals: Dict[str, Dict[str, list]] = {}
+
+    def wrap(self, stage: str, function):
+        @functools.wraps(function)
+        async def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await function(*args, **kwargs)
+            finally:
+                self.record(stage, started, time.perf_counter())
+
+        return timed
+
+    def wrap_sync(self, stage: str, function):
+        @functools.wraps(function)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self.record(stage, started, time.perf_counter())
+
+        return timed
+
+    def record(self, stage: str, started: float, ended: float) -> None:
+        job_id = current_job.get()
+        if job_id is None:
+            return
+        self.intervals.setdefault(job_id, {}).setdefault(stage, []).append(
+            (started, ended)
+        )
+
+    def stage_seconds(self, job_id: str, stage: str) -> float:
+        """Length of the union of a stage's intervals within one job."""
+        total = 0.0
+        current_start = current_end = None
+        for started, ended in sorted(self.intervals.get(job_id, {}).get(stage, [])):
+            if current_end is None or started > current_end:
+                if current_end is not None:
+                    total += current_end - current_start
+                current_start, current_end = started, ended
+            else:
+                current_end = max(current_end, ended)
+        if current_end is not None:
+            total += current_end - current_start
+        return total
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, round(fraction * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(values: List[float]) -> dict:
+    return {
+        "mean": round(sum(values) / len(values), 4) if values else 0.0,
+        "p50": round(percentile(values, 0.50), 4),
+        "p95": round(percentile(values, 0.95), 4),
+        "max": round(max(values), 4) if values else 0.0,
+    }
+
+
+def instrument(app, recorder: StageRecorder, store: InMemoryJobStore, llm) -> None:
+    """Patch the app module so every stage reports into the recorder."""
+    app.get_llm = lambda: llm
+    store.wrap(functools.partial(recorder.wrap, "persistence"))
+    app.job_store = store
+
+    # Dedup and chunking run while pages are still being extracted, so the
+    # extraction stage covers all three and the others are their own time
+    app.extract_file_chunks = recorder.wrap("extraction", app.extract_file_chunks)
+    Deduplicator.feed = recorder.wrap_sync("dedup", Deduplicator.feed)
+    Deduplicator.finish = recorder.wrap_sync("dedup", Deduplicator.finish)
+    ChunkStream.feed = recorder.wrap_sync("chunking", ChunkStream.feed)
+    ChunkStream.finish = recorder.wrap_sync("chunking", ChunkStream.finish)
+    app.chunk_text_with_counts = recorder.wrap_sync(
+        "chunking", app.chunk_text_with_counts
+    )
+    app.select_prompt_chunks = recorder.wrap("selection", app.select_prompt_chunks)
+    for name in (
+        "generate_bullet_points",
+        "generate_quiz_questions",
+        "generate_flashcards",
+    ):
+        setattr(app, name, recorder.wrap("generation", getattr(app, name)))
+    # Serializing and compressing the finished result is part of persisting it
+    app.encode_result = recorder.wrap_sync("persistence", app.encode_result)
+    app.cache_finished_status = recorder.wrap("persistence", app.cache_finished_status)
+
+
+def write_job_files(app, document: dict) -> List[dict]:
+    """Spool one corpus document the way the upload endpoint would."""
+    directory = app.upload_spooler.directory or tempfile.gettempdir()
+    handle, path = tempfile.mkstemp(suffix=".pdf", dir=directory)
+    with os.fdopen(handle, "wb") as output:
+        output.write(document["data"])
+    return [
+        {
+            "filename": document["filename"],
+            "content_type": "application/pdf",
+            "path": path,
+            "size": len(document["data"]),
+            "sha256": hashlib.sha256(document["data"]).hexdigest(),
+        }
+    ]
+
+
+async def run_jobs(app, corpus: List[dict], args, recorder: StageRecorder) -> dict:
+    app.job_scheduler.start()
+    in_flight = asyncio.Semaphore(args.concurrency)
+    job_seconds = {}
+    queue_waits = []
+
+    async def run_job(index: int):
+        document = corpus[index % len(corpus)]
+        doc_uuid = str(uuid.uuid4())
+        async with in_flight:
+            files_data = write_job_files(app, document)
+            created_at = datetime.utcnow().isoformat()
+            await app.create_job_document(
+                doc_uuid,
+                [{"filename": f["filename"], "size": f["size"]} for f in files_data],
+                created_at,
+            )
+            done = asyncio.get_running_loop().create_future()
+
+            async def job(queue_stats: dict):
+                current_job.set(doc_uuid)
+                started = time.perf_counter()
+                try:
+                    await app.process_pdfs_background(
+                        doc_uuid,
+                        files_data,
+                        None,
+                        queue_stats,
+                        created_at=created_at,
+                    )
+                finally:
+                    job_seconds[doc_uuid] = time.perf_counter() - started
+                    queue_waits.append(queue_stats["queue_wait_seconds"])
+                    done.set_result(None)
+
+            app.job_scheduler.submit(doc_uuid, files_data[0]["size"], job)
+            await done
+        return doc_uuid
+
+    started = time.perf_counter()
+    job_ids = await asyncio.gather(*(run_job(index) for index in range(args.jobs)))
+    wall_seconds = time.perf_counter() - started
+    await app.job_scheduler.stop()
+    app.extraction_engine.shutdown()
+
+    return {
+        "job_ids": job_ids,
+        "wall_seconds": wall_seconds,
+        "job_seconds": job_seconds,
+        "queue_waits": queue_waits,
+    }
+
+
+def peak_memory() -> dict:
+    memory = {
+        "max_rss_bytes": max_rss_bytes(),
+        "children_max_rss_bytes": max_rss_bytes(resource.RUSAGE_CHILDREN),
+    }
+    if tracemalloc.is_tracing():
+        memory["python_peak_bytes"] = tracemalloc.get_traced_memory()[1]
+    return memory
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def build_report(app, args, corpus, run: dict, recorder, store, llm) -> dict:
+    job_ids = run["job_ids"]
+    statuses = [store.documents.get(job_id, {}).get("status") for job_id in job_ids]
+    finished = sum(status == "finished" for status in statuses)
+
+    return {
+        "benchmark": "pipeline",
+        "created_at": datetime.utcnow().isoformat(),
+        "revision": git_revision(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "settings": {
+            "jobs": args.jobs,
+            "concurrency": args.concurrency,
+            "corpus_size": len(corpus),
+            "corpus_pages": sum(document["pages"] for document in corpus),
+            "corpus_bytes": sum(len(document["data"]) for document in corpus),
+            "seed": args.seed,
+            "llm_latency": args.llm_latency,
+            "llm_chars_per_second": args.llm_chars_per_second,
+            "store_latency": args.store_latency,
+            "generation_strategy": app.config.generation_strategy,
+            "generation_mode": app.config.generation_mode,
+            "chunker": app.config.chunker,
+            "dedup": app.config.dedup,
+            "chunk_selection": app.config.chunk_selection,
+            "llm_streaming": app.config.llm_streaming,
+            "extraction_workers": app.config.extraction_workers,
+        },
+        "results": {
+            "jobs_finished": finished,
+            "jobs_failed": len(job_ids) - finished,
+            "wall_seconds": round(run["wall_seconds"], 4),
+            "jobs_per_second": round(len(job_ids) / run["wall_seconds"], 4),
+            "job_seconds": summarize(list(run["job_seconds"].values())),
+            "queue_wait_seconds": summarize(run["queue_waits"]),
+            "stages": {
+                stage: summarize(
+                    [recorder.stage_seconds(job_id, stage) for job_id in job_ids]
+                )
+                for stage in STAGES
+            },
+            "llm_calls": llm.calls,
+            "storage_round_trips": store.round_trips,
+            "memory": peak_memory(),
+        },
+    }
+
+
+def flatten(report: dict) -> Dict[str, float]:
+    """Comparable scalar metrics of a report's results section."""
+    results = report["results"]
+    metrics = {
+        "jobs_failed": results["jobs_failed"],
+        "jobs_per_second": results["jobs_per_second"],
+        "wall_seconds": results["wall_seconds"],
+        "job_seconds.p50": results["job_seconds"]["p50"],
+        "job_seconds.p95": results["job_seconds"]["p95"],
+        "llm_calls": results["llm_calls"],
+        "storage_round_trips": results["storage_round_trips"],
+    }
+    for stage, summary in results["stages"].items():
+        metrics[f"stages.{stage}.p50"] = summary["p50"]
+        metrics[f"stages.{stage}.p95"] = summary["p95"]
+    for name, value in results["memory"].items():
+        metrics[f"memory.{name}"] = value
+    return metrics
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> List[str]:
+    """Print a metric-by-metric comparison and return the regressions."""
+    if baseline.get("settings") != current.get("settings"):
+        print("warning: settings differ from the baseline, deltas may mislead")
+
+    baseline_metrics = flatten(baseline)
+    current_metrics = flatten(current)
+    regressions = []
+    print(f"{'metric':<34} {'baseline':>14} {'current':>14} {'delta':>9}")
+    for name, value in current_metrics.items():
+        previous = baseline_metrics.get(name)
+        if previous is None:
+            continue
+        delta = (value - previous) / previous if previous else 0.0
+        worse = -delta if name in HIGHER_IS_BETTER else delta
+        flag = ""
+        if worse > threshold or (name in NO_INCREASE and value > previous):
+            flag = "  REGRESSION"
+            regressions.append(name)
+        print(f"{name:<34} {previous:>14.4f} {value:>14.4f} {delta:>+8.1%}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument("--jobs", type=int, default=24)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--corpus-size", type=int, default=12)
+    parser.add_argument("--min-pages", type=int, default=1)
+    parser.add_argument("--max-pages", type=int, default=40)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--llm-chars-per-second", type=float, default=4000.0)
+    parser.add_argument("--store-latency", type=float, default=0.02)
+    parser.add_argument(
+        "--tracemalloc",
+        action="store_true",
+        help="also report the Python heap peak (slows the run down)",
+    )
+    parser.add_argument("--output", help="write the JSON report to this path")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.10,
+        help="relative change counted as a regression (default 0.10)",
+    )
+    args = parser.parse_args()
+
+    configure_environment(args)
+    app = importlib.import_module("src.main")
+
+    corpus = generate_corpus(
+        args.corpus_size, args.seed, args.min_pages, args.max_pages
+    )
+    llm = FakeLLM(args.llm_latency, args.llm_chars_per_second)
+    store = InMemoryJobStore(args.store_latency)
+    recorder = StageRecorder()
+    instrument(app, recorder, store, llm)
+
+    if args.tracemalloc:
+        tracemalloc.start()
+    run = asyncio.run(run_jobs(app, corpus, args, recorder))
+    report = build_report(app, args, corpus, run, recorder, store, llm)
+
+    print(json.dumps(report["results"], indent=2))
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+        print(f"Report written to {args.output}")
+
+    regressions = []
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(json.load(baseline_file), report, args.threshold)
+    # Failed jobs skew every timing, so the run is never a valid result
+    if report["results"]["jobs_failed"]:
+        print(f"error: {report['results']['jobs_failed']} jobs failed")
+    if regressions or report["results"]["jobs_failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
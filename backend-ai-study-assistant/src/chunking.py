@@ -0,0 +1,248 @@
+import hashlib
+import math
+import re
+from typing import List
+
+from .caching import LRUCache
+from .startup import lazy_import
+
+PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+SENTENCE_SPLIT = re.compile(r"(?<=[.!?;:])\s+")
+
+
+def resolve_encoding(model_name: str):
+    """Return the tiktoken encoding for a model, or None if unavailable."""
+    try:
+        tiktoken = lazy_import("tiktoken")
+    except ImportError:  # pragma: no cover - tiktoken ships with langchain-openai
+        return None
+
+    # OpenRouter names are "<provider>/<model>"; tiktoken only knows the model.
+    # Unknown models raise KeyError, and an encoding whose BPE ranks are not
+    # cached raises whatever the download does (e.g. offline)
+    base_name = model_name.split("/")[-1].split(":")[0]
+    try:
+        return tiktoken.encoding_for_model(base_name)
+    except Exception:
+        pass
+
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        print(f"Token encoding unavailable, estimating token counts: {e}")
+        return None
+
+
+def text_key(text: str) -> str:
+    """Fixed-size cache key, so cached counts never keep whole prompts alive."""
+    digest = hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+    return f"{len(text)}:{digest}"
+
+
+class TokenCounter:
+    """Counts tokens for a model, caching the count of every text segment.
+
+    Counts are cached by a digest of the text, so the cache holds about a
+    hundred bytes per entry however long the texts are. The encoding is
+    loaded on the first count, since tiktoken may have to read or download
+    its BPE ranks.
+    """
+
+    def __init__(self, model_name: str, cache_size: int = 65536):
+        self.model_name = model_name
+        self._encoding = None
+        self._resolved = False
+        self._counts = LRUCache(max_entries=cache_size)
+
+    @property
+    def encoding(self):
+        if not self._resolved:
+            # Resolved once even on failure, so counts fall back to estimates
+            # instead of retrying the download on every call
+            try:
+                self._encoding = resolve_encoding(self.model_name)
+            except Exception as e:
+                print(f"Token encoding unavailable, estimating token counts: {e}")
+                self._encoding = None
+            finally:
+                self._resolved = True
+        return self._encoding
+
+    def count(self, text: str) -> int:
+        key = text_key(text)
+        tokens = self._counts.get(key)
+        if tokens is None:
+            tokens = self._count(text)
+            self._counts.set(key, tokens)
+        return tokens
+
+    def _count(self, text: str) -> int:
+        if self.encoding is None:
+            # Roughly four characters per token for Latin-script text
+            return math.ceil(len(text) / 4)
+        return len(self.encoding.encode(text, disallowed_special=()))
+
+    def cache_info(self) -> dict:
+        return {
+            "hits": self._counts.hits,
+            "misses": self._counts.misses,
+            "size": len(self._counts),
+        }
+
+
+class TokenChunker:
+    """Packs text into chunks that fill a per-request token budget.
+
+    Text is split on paragraphs, then sentences, then words, only as far as
+    needed for each piece to fit, and the pieces are packed greedily. The
+    last segments of a chunk are repeated at the start of the next one, up
+    to ``overlap_tokens``.
+    """
+
+    # Tokens added by the separator between two packed segments
+    SEPARATOR_TOKENS = 1
+
+    def __init__(
+        self, counter: TokenCounter, max_tokens: int = 1000, overlap_tokens: int = 50
+    ):
+        self.counter = counter
+        self.max_tokens = max(1, max_tokens)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.max_tokens // 2))
+
+    def _segments(self, text: str) -> List[tuple]:
+        """Split text into (segment, separator, tokens) pieces under the budget."""
+        # Every packed segment is charged a separator, the first one included
+        limit = max(1, self.max_tokens - self.SEPARATOR_TOKENS)
+        segments = []
+        for paragraph in PARAGRAPH_SPLIT.split(text):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            tokens = self.counter.count(paragraph)
+            if tokens <= limit:
+                segments.append((paragraph, "\n\n", tokens))
+                continue
+
+            for sentence in SENTENCE_SPLIT.split(paragraph):
+                tokens = self.counter.count(sentence)
+                if tokens <= limit:
+                    segments.append((sentence, " ", tokens))
+                else:
+                    segments.extend(self._split_words(sentence, limit))
+        return segments
+
+    def _split_words(self, sentence: str, limit: int) -> List[tuple]:
+        pieces = []
+        words = sentence.split()
+        # Estimate words per piece from the sentence's own token density
+        density = self.counter.count(sentence) / max(1, len(words))
+        step = max(1, int(limit / density))
+        start = 0
+        while start < len(words):
+            size = step
+            piece = " ".join(words[start : start + size])
+            tokens = self.counter.count(piece)
+            # Density varies along the sentence; shrink until the piece fits
+            while tokens > limit and size > 1:
+                size = max(1, min(size - 1, size * limit // tokens))
+                piece = " ".join(words[start : start + size])
+                tokens = self.counter.count(piece)
+            pieces.append((piece, " ", tokens))
+            start += size
+        return pieces
+
+    def split_text(self, text: str) -> List[str]:
+        return [chunk for chunk, _ in self.split_with_counts(text)]
+
+    def split_with_counts(self, text: str) -> List[tuple]:
+        """Return (chunk, token_count) pairs, counted from the cached segments."""
+        stream = self.stream()
+        return stream.feed(text) + stream.finish()
+
+    def stream(self) -> "ChunkStream":
+        return ChunkStream(self)
+
+    def _overlap(self, segments: List[tuple]):
+        carried = []
+        carried_tokens = 0
+        for segment in reversed(segments):
+            tokens = segment[2] + self.SEPARATOR_TOKENS
+            if carried_tokens + tokens > self.overlap_tokens:
+                break
+            carried.insert(0, segment)
+            carried_tokens += tokens
+        return carried, carried_tokens
+
+    @staticmethod
+    def _join(segments: List[tuple]) -> str:
+        parts = []
+        for index, (text, separator, _) in enumerate(segments):
+            if index:
+                parts.append(separator)
+            parts.append(text)
+        return "".join(parts)
+
+
+class ChunkStream:
+    """Chunks text that arrives in pieces, e.g. page by page.
+
+    Only complete paragraphs are segmented and packed; the text after the
+    last blank line waits for the next piece. The chunks are the same as
+    ``split_with_counts`` on the joined text, and a paragraph spread over
+    many pieces is joined once rather than re-scanned on every feed.
+    """
+
+    def __init__(self, chunker: TokenChunker):
+        self.chunker = chunker
+        self.pending: List[str] = []
+        # Whitespace ending the pending text, where a paragraph break may start
+        self.pending_space = ""
+        self.current: List[tuple] = []
+        self.current_tokens = 0
+
+    def feed(self, text: str) -> List[tuple]:
+        """Add text and return the (chunk, token_count) pairs it completed."""
+        window = self.pending_space + text
+        offset = len(self.pending_space)
+        last_break = None
+        for last_break in PARAGRAPH_SPLIT.finditer(window):
+            pass
+
+        if last_break is None:
+            self.pending.append(text)
+            stripped = text.rstrip()
+            if stripped:
+                self.pending_space = text[len(stripped) :]
+            else:
+                self.pending_space += text
+            return []
+
+        complete = "".join(self.pending) + text[: max(0, last_break.start() - offset)]
+        rest = text[last_break.end() - offset :]
+        self.pending = [rest]
+        self.pending_space = rest[len(rest.rstrip()) :]
+        return self._pack(complete)
+
+    def finish(self) -> List[tuple]:
+        """Flush the buffered text and the chunk being filled."""
+        chunks = self._pack("".join(self.pending))
+        self.pending = []
+        self.pending_space = ""
+        if self.current:
+            chunks.append((self.chunker._join(self.current), self.current_tokens))
+            self.current, self.current_tokens = [], 0
+        return chunks
+
+    def _pack(self, text: str) -> List[tuple]:
+        chunker = self.chunker
+        chunks = []
+        for segment in chunker._segments(text):
+            tokens = segment[2] + chunker.SEPARATOR_TOKENS
+            if self.current and self.current_tokens + tokens > chunker.max_tokens:
+                chunks.append((chunker._join(self.current), self.current_tokens))
+                self.current, self.current_tokens = chunker._overlap(self.current)
+                if self.current_tokens + tokens > chunker.max_tokens:
+                    self.current, self.current_tokens = [], 0
+            self.current.append(segment)
+            self.current_tokens += tokens
+        return chunks
@@ -0,0 +1,198 @@
+import re
+import zlib
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+WORD_PATTERN = re.compile(r"\w+", re.UNICODE)
+# A line that is only a page number: "12", "- 12 -", "page 12", "12 / 40"
+PAGE_NUMBER = re.compile(
+    r"^[-–—\s]*(?:(?:page|página|pág|pag|p)\.?\s*)?"
+    r"\d+(?:\s*(?:/|of|de)\s*\d+)?[-–—\s]*$"
+)
+# Only with a four-digit year, so section numbers such as 3.1.2 are kept
+DATE = re.compile(
+    r"\b(?:\d{4}[-/.]\d{1,2}[-/.]\d{1,2}|\d{1,2}[-/.]\d{1,2}[-/.]\d{4})\b"
+)
+PARAGRAPH_SPLIT = re.compile(r"\n\s*\n")
+MERSENNE_PRIME = (1 << 61) - 1
+SHINGLE_BASE = np.uint64(1_000_003)
+
+
+def line_key(line: str) -> str:
+    """Normalize a line so page numbers, dates and spacing match across pages.
+
+    Other numbers are kept, so lines such as "Theorem 2" or "Example 3.1"
+    stay distinct and are not taken for a repeated header.
+    """
+    key = " ".join(line.lower().split())
+    if PAGE_NUMBER.match(key):
+        return "#"
+    return DATE.sub("#", key)
+
+
+class MinHasher:
+    """MinHash signatures of word shingles, computed with NumPy.
+
+    Each permutation is a universal hash (a * x + b) mod 2^61 - 1 of the
+    32-bit shingle hashes, applied to every shingle of a text at once.
+    """
+
+    def __init__(self, num_perm: int = 64, shingle_words: int = 5, seed: int = 1):
+        self.shingle_words = shingle_words
+        rng = np.random.default_rng(seed)
+        # a < 2^29 keeps a * x + b below 2^63 for 32-bit x, so uint64 never wraps
+        self.a = rng.integers(1, 1 << 29, size=(num_perm, 1), dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, size=(num_perm, 1), dtype=np.uint64)
+
+    def shingles(self, words: List[str]) -> np.ndarray:
+        """32-bit hashes of every run of ``shingle_words`` consecutive words."""
+        word_hashes = np.fromiter(
+            (zlib.crc32(word.encode("utf-8")) for word in words),
+            dtype=np.uint64,
+            count=len(words),
+        )
+        count = len(words) - self.shingle_words + 1
+        hashes = np.zeros(count, dtype=np.uint64)
+        for offset in range(self.shingle_words):
+            # Polynomial rolling hash; uint64 arithmetic wraps around
+            hashes = hashes * SHINGLE_BASE + word_hashes[offset : offset + count]
+        return (hashes ^ (hashes >> np.uint64(32))) & np.uint64(0xFFFFFFFF)
+
+    def signature(self, words: List[str]) -> np.ndarray:
+        shingles = self.shingles(words)
+        return ((self.a * shingles + self.b) % np.uint64(MERSENNE_PRIME)).min(axis=1)
+
+
+class Deduplicator:
+    """Strips boilerplate lines and near-duplicate paragraphs from pages.
+
+    A line whose normalized form is on ``min_line_pages`` pages or more is
+    treated as a header, footer or page number. The first
+    ``window_pages`` pages are held back until their line counts are known;
+    after that each page is cleaned as it arrives, against the counts so
+    far, so a line first repeated late in the upload is only stripped from
+    then on.
+
+    Paragraphs (or whole pages without blank lines) whose estimated Jaccard
+    similarity to an earlier one reaches ``similarity`` are dropped. Banded
+    LSH limits each lookup to ``bands`` candidates, so the whole pass is
+    linear in the size of the text. ``duplicate_sources`` maps a file index
+    to the earlier files its dropped paragraphs matched.
+    """
+
+    def __init__(
+        self,
+        min_line_pages: int = 3,
+        similarity: float = 0.8,
+        window_pages: int = 8,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_words: int = 5,
+        count_tokens: Optional[Callable[[str], int]] = None,
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.min_line_pages = max(2, min_line_pages)
+        self.similarity = similarity
+        self.window_pages = window_pages
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.hasher = MinHasher(num_perm, shingle_words)
+        self.count_tokens = count_tokens
+
+        self.line_pages = Counter()
+        self.pending: List[Tuple[int, str]] = []
+        self.streaming = False
+        self.signatures: List[np.ndarray] = []
+        self.owners: List[int] = []
+        self.duplicate_sources: Dict[int, Set[int]] = {}
+        self.buckets: Dict[Tuple[int, bytes], int] = {}
+        self.stats = {
+            "lines_removed": 0,
+            "paragraphs_removed": 0,
+            "characters_removed": 0,
+            "tokens_removed": 0,
+        }
+
+    def feed(self, file_index: int, page_text: str) -> List[Tuple[int, str]]:
+        """Add a page and return the (file_index, page_text) pages now clean."""
+        self.line_pages.update({line_key(line) for line in page_text.splitlines()})
+        if self.streaming:
+            return [(file_index, self._clean(file_index, page_text))]
+
+        self.pending.append((file_index, page_text))
+        if len(self.pending) < self.window_pages:
+            return []
+        return self.finish()
+
+    def finish(self) -> List[Tuple[int, str]]:
+        """Clean and return the pages still held back."""
+        self.streaming = True
+        pending, self.pending = self.pending, []
+        return [
+            (file_index, self._clean(file_index, text)) for file_index, text in pending
+        ]
+
+    def prime(self, file_index: int, text: str) -> None:
+        """Register already cleaned text so later paragraphs are checked against it.
+
+        Call ``finish`` first so held back pages keep their place in order.
+        """
+        for paragraph in PARAGRAPH_SPLIT.split(text):
+            self._match(file_index, paragraph)
+
+    def _clean(self, file_index: int, page_text: str) -> str:
+        removed = []
+        kept_lines = []
+        for line in page_text.splitlines():
+            key = line_key(line)
+            if key and self.line_pages[key] >= self.min_line_pages:
+                removed.append(line)
+                self.stats["lines_removed"] += 1
+            else:
+                kept_lines.append(line)
+
+        kept_paragraphs = []
+        for paragraph in PARAGRAPH_SPLIT.split("\n".join(kept_lines)):
+            owner = self._match(file_index, paragraph)
+            if owner is None:
+                kept_paragraphs.append(paragraph)
+                continue
+            removed.append(paragraph)
+            self.stats["paragraphs_removed"] += 1
+            if owner != file_index:
+                self.duplicate_sources.setdefault(file_index, set()).add(owner)
+
+        if removed:
+            removed_text = "\n".join(removed)
+            self.stats["characters_removed"] += len(removed_text)
+            if self.count_tokens is not None:
+                self.stats["tokens_removed"] += self.count_tokens(removed_text)
+        return "\n\n".join(kept_paragraphs)
+
+    def _match(self, file_index: int, paragraph: str) -> Optional[int]:
+        """Return the file of a kept near-duplicate, or register the paragraph."""
+        words = WORD_PATTERN.findall(paragraph.lower())
+        # Too short to shingle reliably; repeated short lines are handled above
+        if len(words) < 2 * self.hasher.shingle_words:
+            return None
+
+        signature = self.hasher.signature(words)
+        keys = [
+            (band, signature[band * self.rows : (band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+        candidates = {self.buckets[key] for key in keys if key in self.buckets}
+        for candidate in candidates:
+            agreement = np.mean(self.signatures[candidate] == signature)
+            if agreement >= self.similarity:
+                return self.owners[candidate]
+
+        index = len(self.signatures)
+        self.signatures.append(signature)
+        self.owners.append(file_index)
+        for key in keys:
+            self.buckets.setdefault(key, index)
+        return None
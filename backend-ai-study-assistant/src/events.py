@@ -0,0 +1,65 @@
+import asyncio
+import json
+from datetime import datetime
+from typing import Dict, Optional, Set
+
+from .caching import LRUCache
+
+TERMINAL_STATUSES = {"finished", "error"}
+
+
+class JobEventBus:
+    """In-process pub/sub for job stage transitions.
+
+    The latest event of each job is kept so late subscribers start from the
+    current state without reading storage.
+    """
+
+    def __init__(self, max_jobs: int = 1000):
+        self._subscribers: Dict[str, Set[asyncio.Queue]] = {}
+        self._latest = LRUCache(max_entries=max_jobs)
+        self._sequence = 0
+
+    def publish(self, job_id: str, stage: str, status: str = "processing", **data):
+        """Record a stage transition and push it to every subscriber."""
+        self._sequence += 1
+        event = {
+            "id": self._sequence,
+            "uuid": job_id,
+            "stage": stage,
+            "status": status,
+            "updated_at": datetime.utcnow().isoformat(),
+            **data,
+        }
+        self._latest.set(job_id, event)
+
+        for queue in self._subscribers.get(job_id, ()):
+            queue.put_nowait(event)
+
+    def latest(self, job_id: str) -> Optional[dict]:
+        return self._latest.get(job_id)
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        self._subscribers.setdefault(job_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, job_id: str, queue: asyncio.Queue) -> None:
+        subscribers = self._subscribers.get(job_id)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._subscribers[job_id]
+
+    def stats(self) -> dict:
+        return {
+            "tracked_jobs": len(self._latest),
+            "subscribers": sum(len(queues) for queues in self._subscribers.values()),
+        }
+
+
+def format_sse(event: dict) -> str:
+    """Serialize an event in the text/event-stream wire format."""
+    payload = json.dumps(event, default=str)
+    return f"id: {event.get('id', 0)}\ndata: {payload}\n\n"
@@ -0,0 +1,413 @@
+import asyncio
+import importlib.util
+import mmap
+import multiprocessing
+from abc import ABC, abstractmethod
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from threading import Lock
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .startup import lazy_import
+
+
+class PDFBackend(ABC):
+    """Reads page counts and page text from a PDF on disk.
+
+    Backends are stateless so worker processes can look them up by name.
+    """
+
+    name = "base"
+    module = ""
+
+    @classmethod
+    def available(cls) -> bool:
+        return importlib.util.find_spec(cls.module) is not None
+
+    @abstractmethod
+    def page_count(self, path: str) -> int:
+        """Number of pages in the PDF."""
+
+    @abstractmethod
+    def iter_pages(self, path: str, page_numbers: Sequence[int]) -> Iterator[str]:
+        """Yield the text of the given pages one at a time, in that order."""
+
+
+@contextmanager
+def open_pdf(path: str):
+    """Open a spooled PDF memory-mapped instead of reading it into the heap."""
+    with open(path, "rb") as pdf_file:
+        mapped = mmap.mmap(pdf_file.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        yield lazy_import("PyPDF2").PdfReader(mapped)
+    finally:
+        mapped.close()
+
+
+class PyPDF2Backend(PDFBackend):
+    name = "pypdf2"
+    module = "PyPDF2"
+
+    def page_count(self, path: str) -> int:
+        with open_pdf(path) as pdf_reader:
+            return len(pdf_reader.pages)
+
+    def iter_pages(self, path: str, page_numbers: Sequence[int]) -> Iterator[str]:
+        with open_pdf(path) as pdf_reader:
+            for page_number in page_numbers:
+                yield pdf_reader.pages[page_number].extract_text()
+
+
+class PdfiumBackend(PDFBackend):
+    """PDFium bindings; usually several times faster than PyPDF2."""
+
+    name = "pypdfium2"
+    module = "pypdfium2"
+
+    # PDFium is not thread-safe. This only contends when extraction runs in
+    # threads (EXTRACTION_WORKERS=0); each worker process has its own lock.
+    lock = Lock()
+
+    def page_count(self, path: str) -> int:
+        pdfium = lazy_import("pypdfium2")
+        with self.lock:
+            document = pdfium.PdfDocument(path)
+            try:
+                return len(document)
+            finally:
+                document.close()
+
+    def iter_pages(self, path: str, page_numbers: Sequence[int]) -> Iterator[str]:
+        pdfium = lazy_import("pypdfium2")
+        # Held until the generator is exhausted or closed
+        with self.lock:
+            document = pdfium.PdfDocument(path)
+            try:
+                for page_number in page_numbers:
+                    page = document[page_number]
+                    text_page = page.get_textpage()
+                    text = text_page.get_text_range()
+                    text_page.close()
+                    page.close()
+                    yield text.replace("\r\n", "\n")
+            finally:
+                document.close()
+
+
+class PdfminerBackend(PDFBackend):
+    """pdfminer.six layout analysis; slower, but handles unusual encodings."""
+
+    name = "pdfminer"
+    module = "pdfminer"
+
+    def page_count(self, path: str) -> int:
+        pdfpage = lazy_import("pdfminer.pdfpage")
+        with open(path, "rb") as pdf_file:
+            return sum(1 for _ in pdfpage.PDFPage.get_pages(pdf_file))
+
+    def iter_pages(self, path: str, page_numbers: Sequence[int]) -> Iterator[str]:
+        if not page_numbers:
+            return
+        high_level = lazy_import("pdfminer.high_level")
+        layout = lazy_import("pdfminer.layout")
+        # pdfminer walks the document front to back: ascending requests
+        # stream, any other order is buffered and replayed
+        wanted = sorted(set(page_numbers))
+        ordered = list(page_numbers) == wanted
+        texts = {}
+        page_layouts = high_level.extract_pages(
+            path, page_numbers=set(wanted), maxpages=wanted[-1] + 1
+        )
+        for page_number, page_layout in zip(wanted, page_layouts):
+            text = "".join(
+                element.get_text()
+                for element in page_layout
+                if isinstance(element, layout.LTTextContainer)
+            )
+            if ordered:
+                yield text
+            else:
+                texts[page_number] = text
+        if not ordered:
+            for page_number in page_numbers:
+                yield texts[page_number]
+
+
+BACKENDS: Dict[str, PDFBackend] = {
+    backend.name: backend
+    for backend in (PdfiumBackend(), PyPDF2Backend(), PdfminerBackend())
+}
+# "auto" takes the first installed backend in this order
+AUTO_ORDER = ("pypdfium2", "pypdf2", "pdfminer")
+
+
+def resolve_backend(name: str) -> str:
+    """Map a configured backend name, or "auto", to an installed backend."""
+    name = name.lower()
+    if name == "auto":
+        for candidate in AUTO_ORDER:
+            if BACKENDS[candidate].available():
+                return candidate
+        raise ValueError("No PDF extraction backend is installed")
+
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown PDF backend {name!r}, expected auto or one of "
+            f"{', '.join(BACKENDS)}"
+        )
+    if not BACKENDS[name].available():
+        raise ValueError(f"PDF backend {name!r} is not installed")
+    return name
+
+
+# Worker functions (module level so they can be pickled into the process pool)
+def count_pages(backend: str, path: str) -> int:
+    """Return the number of pages in a PDF."""
+    return BACKENDS[backend].page_count(path)
+
+
+def extract_pages(backend: str, path: str, page_numbers: Sequence[int]) -> List[str]:
+    """Extract the text of the given pages from a PDF, one entry per page."""
+    return list(BACKENDS[backend].iter_pages(path, page_numbers))
+
+
+def process_context():
+    """Start method for the extraction workers.
+
+    The server process runs gRPC, httpx and asyncio threads, and forking it
+    could copy a lock one of them holds into a worker that then waits on it
+    forever. A forkserver forks workers from a clean single-threaded
+    process instead; spawn is the fallback where it is not available.
+    """
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("spawn")
+    context = multiprocessing.get_context("forkserver")
+    # Workers start with the backends imported, not the whole application
+    context.set_forkserver_preload([__name__])
+    return context
+
+
+def spread_order(page_count: int) -> List[int]:
+    """Page indices ordered so that every prefix is spread over the document.
+
+    Follows the van der Corput sequence: 0, n/2, n/4, 3n/4, n/8... Its
+    first 2^k points are 1/2^k apart, so every page appears once 2^k
+    reaches the page count.
+    """
+    order = []
+    seen = set()
+    index = 0
+    while len(order) < page_count:
+        position, denominator, rest = 0.0, 1.0, index
+        while rest:
+            denominator *= 2
+            rest, bit = divmod(rest, 2)
+            position += bit / denominator
+        page = int(position * page_count)
+        if page not in seen:
+            seen.add(page)
+            order.append(page)
+        index += 1
+    return order
+
+
+def sample_order(page_counts: List[int]) -> List[Tuple[int, int]]:
+    """(file_index, page) pairs taking turns between files.
+
+    Any prefix gives each file an equal number of pages (until a file runs
+    out) spread across that file, see ``spread_order``.
+    """
+    orders = [spread_order(page_count) for page_count in page_counts]
+    return [
+        (file_index, order[rank])
+        for rank in range(max(page_counts, default=0))
+        for file_index, order in enumerate(orders)
+        if rank < len(order)
+    ]
+
+
+def count_page(stats: dict, page_text: str) -> None:
+    stats["pages"] += 1
+    if page_text and not page_text.isspace():
+        stats["text_pages"] += 1
+
+
+def file_header(filename: str) -> str:
+    return f"=== Content from {filename} ===\n"
+
+
+class PDFExtractionEngine:
+    """Extracts PDF text off the event loop, split per file and page range.
+
+    Page ranges of every file are extracted ahead of the consumer, at most
+    ``prefetch_tasks`` at a time, and their pages are yielded in upload
+    order, so downstream work can start before extraction finishes.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        pages_per_task: int = 20,
+        backend: str = "auto",
+        prefetch_tasks: Optional[int] = None,
+    ):
+        self.max_workers = max_workers
+        self.pages_per_task = max(1, pages_per_task)
+        self.backend = resolve_backend(backend)
+        self.prefetch_tasks = prefetch_tasks or max(2, 2 * max_workers)
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        # max_workers <= 0 keeps extraction in the default thread pool
+        if self.max_workers <= 0:
+            return None
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers, mp_context=process_context()
+            )
+        return self._executor
+
+    def _run(self, func, *args) -> asyncio.Future:
+        loop = asyncio.get_running_loop()
+        return loop.run_in_executor(self._get_executor(), func, *args)
+
+    async def _page_counts(self, files_data: List[dict]) -> List[int]:
+        async def count(file_data: dict) -> int:
+            try:
+                return await self._run(count_pages, self.backend, file_data["path"])
+            except Exception as e:
+                raise Exception(f"Error processing {file_data['filename']}: {str(e)}")
+
+        return await asyncio.gather(*(count(file_data) for file_data in files_data))
+
+    async def iter_pages(
+        self,
+        files_data: List[dict],
+        stats: Optional[dict] = None,
+        budget_chars: int = 0,
+    ) -> AsyncIterator[Tuple[int, str]]:
+        """Yield (file_index, page_text) for every page, in upload order.
+
+        With a ``budget_chars`` above 0, pages are read in ``sample_order``
+        until that much text is collected and only those pages are yielded,
+        still in document order. When ``stats`` is given, it receives the
+        page count of the uploads ("total_pages"), the pages read ("pages"),
+        the ones with any text ("text_pages") and, with a budget, whether it
+        cut extraction short ("sampled") and the indices of the files it
+        did not read in full ("sampled_files").
+        """
+        page_counts = await self._page_counts(files_data)
+        if stats is None:
+            stats = {}
+        stats["total_pages"] = stats.get("total_pages", 0) + sum(page_counts)
+        stats.setdefault("pages", 0)
+        stats.setdefault("text_pages", 0)
+
+        if budget_chars > 0:
+            sampled = await self._extract_sample(
+                files_data, page_counts, budget_chars, stats
+            )
+            read = sum(len(pages) for pages in sampled)
+            stats["sampled"] = stats.get("sampled", False) or read < sum(page_counts)
+            stats["sampled_files"] = [
+                file_index
+                for file_index, pages in enumerate(sampled)
+                if len(pages) < page_counts[file_index]
+            ]
+            for file_index, pages in enumerate(sampled):
+                for page_number in sorted(pages):
+                    yield file_index, pages[page_number]
+            return
+
+        tasks = deque(
+            (file_index, range(start, min(start + self.pages_per_task, page_count)))
+            for file_index, page_count in enumerate(page_counts)
+            for start in range(0, page_count, self.pages_per_task)
+        )
+        in_flight = deque()
+
+        def schedule() -> None:
+            while tasks and len(in_flight) < self.prefetch_tasks:
+                file_index, page_numbers = tasks.popleft()
+                path = files_data[file_index]["path"]
+                future = self._run(extract_pages, self.backend, path, page_numbers)
+                in_flight.append((file_index, future))
+
+        try:
+            schedule()
+            while in_flight:
+                file_index, future = in_flight.popleft()
+                try:
+                    pages = await future
+                except Exception as e:
+                    filename = files_data[file_index]["filename"]
+                    raise Exception(f"Error processing {filename}: {str(e)}")
+                schedule()
+                for page_text in pages:
+                    count_page(stats, page_text)
+                    yield file_index, page_text
+        finally:
+            # The consumer stopped early or a page range failed
+            for _, future in in_flight:
+                future.cancel()
+
+    async def _extract_sample(
+        self,
+        files_data: List[dict],
+        page_counts: List[int],
+        budget_chars: int,
+        stats: dict,
+    ) -> List[Dict[int, str]]:
+        """Read pages in sample order until ``budget_chars`` is collected.
+
+        Tasks group up to ``pages_per_task`` consecutive picks of one file;
+        at most ``prefetch_tasks`` run ahead, and are cancelled once the
+        budget is met.
+        """
+        per_file: Dict[int, List[int]] = {}
+        for file_index, page_number in sample_order(page_counts):
+            per_file.setdefault(file_index, []).append(page_number)
+        # Batch j of every file before batch j + 1 of any, as in sample order
+        tasks = deque(
+            (file_index, pages[start : start + self.pages_per_task])
+            for start in range(0, max(page_counts, default=0), self.pages_per_task)
+            for file_index, pages in sorted(per_file.items())
+            if start < len(pages)
+        )
+        in_flight = deque()
+        sampled: List[Dict[int, str]] = [{} for _ in files_data]
+        collected = 0
+
+        def schedule() -> None:
+            while tasks and len(in_flight) < self.prefetch_tasks:
+                file_index, page_numbers = tasks.popleft()
+                path = files_data[file_index]["path"]
+                future = self._run(extract_pages, self.backend, path, page_numbers)
+                in_flight.append((file_index, page_numbers, future))
+
+        try:
+            schedule()
+            while in_flight and collected < budget_chars:
+                file_index, page_numbers, future = in_flight.popleft()
+                try:
+                    texts = await future
+                except Exception as e:
+                    filename = files_data[file_index]["filename"]
+                    raise Exception(f"Error processing {filename}: {str(e)}")
+                schedule()
+                for page_number, page_text in zip(page_numbers, texts):
+                    if collected >= budget_chars:
+                        break
+                    sampled[file_index][page_number] = page_text
+                    collected += len(page_text)
+                    count_page(stats, page_text)
+        finally:
+            for _, _, future in in_flight:
+                future.cancel()
+        return sampled
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
@@ -0,0 +1,171 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from threading import Lock
+from typing import Optional
+
+from .caching import LRUCache
+
+
+def llm_cache_key(
+    model_name: str, temperature: float, system_prompt: str, human_prompt: str
+) -> str:
+    """Hash everything that determines an LLM reply."""
+    key_material = json.dumps(
+        [model_name, temperature, system_prompt, human_prompt], ensure_ascii=False
+    )
+    return hashlib.sha256(key_material.encode("utf-8")).hexdigest()
+
+
+class LLMResponseCache:
+    """Two-tier cache of LLM replies: in-memory LRU in front of SQLite.
+
+    Each entry stores the reply text, its token usage and how long the
+    original call took, which is what the saved-latency counter adds up.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str],
+        memory_entries: int = 512,
+        max_rows: int = 20000,
+        ttl_seconds: int = 7 * 24 * 3600,
+    ):
+        self.path = path
+        self.max_rows = max_rows
+        self.ttl_seconds = ttl_seconds
+        self.memory = LRUCache(max_entries=memory_entries)
+        self.disk_hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._lock = Lock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+        if self.path:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS llm_responses_accessed_at "
+                "ON llm_responses (accessed_at)"
+            )
+            self._connection.commit()
+
+    async def get(self, key: str) -> Optional[dict]:
+        entry = self.memory.get(key)
+        if entry is not None and self._expired(entry):
+            self.memory.delete(key)
+            entry = None
+        if entry is None and self._connection is not None:
+            entry = await asyncio.to_thread(self._disk_get, key)
+            if entry is not None:
+                self.disk_hits += 1
+                self.memory.set(key, entry)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.saved_seconds += entry.get("latency_seconds", 0.0)
+        return entry
+
+    async def set(self, key: str, entry: dict) -> None:
+        entry = {**entry, "cached_at": time.time()}
+        self.memory.set(key, entry)
+        if self._connection is not None:
+            await asyncio.to_thread(self._disk_set, key, entry)
+
+    async def delete(self, key: str) -> None:
+        self.memory.delete(key)
+        if self._connection is not None:
+            await asyncio.to_thread(self._disk_delete, key)
+
+    def _expired(self, entry: dict) -> bool:
+        if not self.ttl_seconds:
+            return False
+        return time.time() - entry.get("cached_at", 0) > self.ttl_seconds
+
+    def _disk_get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response, created_at FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl_seconds and now - row[1] > self.ttl_seconds:
+                self._connection.execute(
+                    "DELETE FROM llm_responses WHERE key = ?", (key,)
+                )
+                self._connection.commit()
+                return None
+            self._connection.execute(
+                "UPDATE llm_responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+            self._connection.commit()
+        return json.loads(row[0])
+
+    def _disk_set(self, key: str, entry: dict) -> None:
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO llm_responses VALUES (?, ?, ?, ?)",
+                (key, json.dumps(entry), now, now),
+            )
+            self._evict(now)
+            self._connection.commit()
+
+    def _disk_delete(self, key: str) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM llm_responses WHERE key = ?", (key,))
+            self._connection.commit()
+
+    def _evict(self, now: float) -> None:
+        if self.ttl_seconds:
+            self._connection.execute(
+                "DELETE FROM llm_responses WHERE created_at < ?",
+                (now - self.ttl_seconds,),
+            )
+        # Least recently used rows go first once the table is over its cap
+        self._connection.execute(
+            """
+            DELETE FROM llm_responses WHERE key IN (
+                SELECT key FROM llm_responses ORDER BY accessed_at DESC
+                LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_rows,),
+        )
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def stats(self) -> dict:
+        memory_stats = self.memory.stats()
+        hits = memory_stats["hits"] + self.disk_hits
+        lookups = hits + self.misses
+        return {
+            "memory_hits": memory_stats["hits"],
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+            "saved_latency_seconds": round(self.saved_seconds, 3),
+            "memory_entries": memory_stats["entries"],
+        }
@@ -0,0 +1,204 @@
+import asyncio
+import random
+import time
+from typing import Awaitable, Callable, Optional
+
+from .startup import lazy_import
+
+
+def is_overload_error(error: Exception) -> bool:
+    """True for 429/5xx and transport errors worth retrying."""
+    openai = lazy_import("openai")
+    retryable_errors = (
+        openai.RateLimitError,
+        openai.APIConnectionError,
+        openai.APITimeoutError,
+        openai.InternalServerError,
+    )
+    if isinstance(error, retryable_errors):
+        return True
+    status_code = getattr(error, "status_code", None)
+    return status_code == 429 or (status_code is not None and status_code >= 500)
+
+
+class TokenBucket:
+    """Token bucket refilled continuously at ``per_minute`` units per minute.
+
+    ``acquire`` reserves capacity up front and lets the level go negative,
+    so waiters are served in arrival order. A rate of 0 disables the bucket.
+    """
+
+    def __init__(self, per_minute: int):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.throttled_seconds = 0.0
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.rate > 0
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1) -> None:
+        if not self.enabled:
+            return
+
+        amount = min(amount, self.capacity)
+        async with self._lock:
+            self._refill()
+            self.level -= amount
+            wait = max(0.0, -self.level / self.rate)
+
+        if wait:
+            self.throttled_seconds += wait
+            await asyncio.sleep(wait)
+
+    def adjust(self, delta: float) -> None:
+        """Charge (or refund) the difference between estimated and real usage."""
+        if not self.enabled:
+            return
+        self._refill()
+        self.level = min(self.capacity, self.level - delta)
+
+    def stats(self) -> dict:
+        if not self.enabled:
+            return {"enabled": False}
+        self._refill()
+        return {
+            "enabled": True,
+            "per_minute": int(self.capacity),
+            "available": round(self.level, 1),
+            "throttled_seconds": round(self.throttled_seconds, 3),
+        }
+
+
+class AdaptiveConcurrencyLimiter:
+    """AIMD limit on in-flight requests.
+
+    Each success raises the limit by roughly one per window of ``limit``
+    requests. An overload response halves it, at most once per cooldown,
+    so a burst of 429s counts as a single congestion signal. Other errors
+    and cancelled requests leave it unchanged.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        minimum: int = 1,
+        maximum: int = 32,
+        decrease_factor: float = 0.5,
+        cooldown_seconds: float = 2.0,
+    ):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.limit = float(min(max(initial, self.minimum), self.maximum))
+        self.decrease_factor = decrease_factor
+        self.cooldown_seconds = cooldown_seconds
+        self.in_flight = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._condition = asyncio.Condition()
+
+    async def acquire(self) -> None:
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, overloaded: bool = False, succeeded: bool = True) -> None:
+        async with self._condition:
+            self.in_flight -= 1
+            now = time.monotonic()
+            if overloaded:
+                if now - self._last_decrease >= self.cooldown_seconds:
+                    self.limit = max(self.minimum, self.limit * self.decrease_factor)
+                    self._last_decrease = now
+                    self.decreases += 1
+            elif succeeded:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._condition.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+            "decreases": self.decreases,
+        }
+
+
+class LLMRateLimiter:
+    """Request and token buckets plus adaptive concurrency for LLM calls.
+
+    Overload errors are retried with full-jitter exponential backoff; any
+    other error is raised immediately.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = 0,
+        tokens_per_minute: int = 0,
+        concurrency: Optional[AdaptiveConcurrencyLimiter] = None,
+        max_retries: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+    ):
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.concurrency = concurrency or AdaptiveConcurrencyLimiter()
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.calls = 0
+        self.retries = 0
+        self.overloads = 0
+        self.failures = 0
+
+    async def call(self, request: Callable[[], Awaitable], estimated_tokens: int = 0):
+        """Run ``request`` under the limits, returning its result."""
+        for attempt in range(self.max_retries + 1):
+            await self.requests.acquire(1)
+            await self.tokens.acquire(estimated_tokens)
+            await self.concurrency.acquire()
+
+            overloaded = False
+            succeeded = False
+            try:
+                self.calls += 1
+                result = await request()
+                succeeded = True
+                return result
+            except Exception as e:
+                overloaded = is_overload_error(e)
+                if not overloaded or attempt == self.max_retries:
+                    self.failures += 1
+                    raise
+                self.overloads += 1
+            finally:
+                # A cancelled request says nothing about capacity
+                await self.concurrency.release(overloaded, succeeded)
+
+            self.retries += 1
+            backoff = min(self.max_delay, self.base_delay * 2**attempt)
+            await asyncio.sleep(random.uniform(0, backoff))
+
+    def record_usage(self, estimated_tokens: int, actual_tokens: int) -> None:
+        if actual_tokens:
+            self.tokens.adjust(actual_tokens - estimated_tokens)
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "overloads": self.overloads,
+            "failures": self.failures,
+            "concurrency": self.concurrency.stats(),
+            "requests_bucket": self.requests.stats(),
+            "tokens_bucket": self.tokens.stats(),
+        }
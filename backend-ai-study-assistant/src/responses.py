@@ -0,0 +1,95 @@
+import gzip
+import hashlib
+import json
+from typing import Optional, Tuple
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli is optional
+    brotli = None
+
+# Preferred first when the client accepts several encodings with equal weight
+ENCODING_PREFERENCE = ("br", "gzip")
+
+
+def dumps(payload) -> bytes:
+    """Serialize to compact UTF-8 JSON, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(
+        payload, ensure_ascii=False, separators=(",", ":"), default=str
+    ).encode("utf-8")
+
+
+def loads(data):
+    """Parse JSON text or bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def parse_accept_encoding(header: Optional[str]) -> dict:
+    """Map each coding in an Accept-Encoding header to its q-value."""
+    weights = {}
+    for part in (header or "").split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+    return weights
+
+
+class EncodedJSON:
+    """A JSON body serialized and compressed once, then served as-is.
+
+    The ETag is a hash of the uncompressed bytes, so every encoding of the
+    same payload shares it and a client revalidates with a single value.
+    """
+
+    def __init__(self, payload, compress_min_bytes: int = 1024):
+        self.body = dumps(payload)
+        self.etag = '"' + hashlib.sha256(self.body).hexdigest()[:32] + '"'
+        self.encodings = {}
+        if len(self.body) >= compress_min_bytes:
+            self.encodings["gzip"] = gzip.compress(self.body, 6, mtime=0)
+            if brotli is not None:
+                self.encodings["br"] = brotli.compress(self.body, quality=5)
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(body) for body in self.encodings.values())
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """True when the client already holds this exact body."""
+        if not if_none_match:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or any(tag.removeprefix("W/") == self.etag for tag in tags)
+
+    def select(self, accept_encoding: Optional[str]) -> Tuple[Optional[str], bytes]:
+        """Pick the best stored encoding the client accepts."""
+        weights = parse_accept_encoding(accept_encoding)
+        best, best_weight = None, 0.0
+        for encoding in ENCODING_PREFERENCE:
+            if encoding not in self.encodings:
+                continue
+            weight = weights.get(encoding, weights.get("*", 0.0))
+            if weight > best_weight:
+                best, best_weight = encoding, weight
+
+        if best is None:
+            return None, self.body
+        return best, self.encodings[best]
@@ -0,0 +1,104 @@
+import json
+import zlib
+from typing import List, Tuple
+
+from .responses import dumps
+
+BLOB_ENCODING = "json+zlib"
+
+# Firestore documents are limited to 1 MiB, field names included
+MAX_BLOB_BYTES = 900 * 1024
+
+
+def encode_blob(items: list) -> bytes:
+    return zlib.compress(dumps(items), 6)
+
+
+def decode_blob(data: bytes) -> list:
+    return json.loads(zlib.decompress(data))
+
+
+def encode_record(record: dict, items: int) -> dict:
+    """Compress a JSON record into a blob stored next to the result blobs."""
+    data = zlib.compress(dumps(record), 6)
+    return {"encoding": BLOB_ENCODING, "items": items, "data": data}
+
+
+def decode_record(data: bytes) -> dict:
+    return json.loads(zlib.decompress(data))
+
+
+def split_blob(artifact: str, blob: dict, max_bytes: int = MAX_BLOB_BYTES) -> dict:
+    """Spread a blob over several of at most ``max_bytes`` of data each.
+
+    The first part keeps the artifact name and records the number of parts
+    in its encoding (``json+zlib;parts=3``); the others are stored as
+    ``<artifact>.1``, ``<artifact>.2`` and so on.
+    """
+    data = blob["data"]
+    if len(data) <= max_bytes:
+        return {artifact: blob}
+
+    parts = [
+        data[start : start + max_bytes] for start in range(0, len(data), max_bytes)
+    ]
+    blobs = {
+        artifact: {
+            **blob,
+            "encoding": f"{blob['encoding']};parts={len(parts)}",
+            "data": parts[0],
+        }
+    }
+    for name, part in zip(part_artifacts(artifact, len(parts)), parts[1:]):
+        blobs[name] = {**blob, "data": part}
+    return blobs
+
+
+def blob_parts(blob: dict) -> int:
+    _, _, parts = blob["encoding"].partition(";parts=")
+    return int(parts) if parts else 1
+
+
+def part_artifacts(artifact: str, parts: int) -> List[str]:
+    """Names of the parts stored after the first one."""
+    return [f"{artifact}.{index}" for index in range(1, parts)]
+
+
+def join_blob(blob: dict, parts: List[dict]) -> dict:
+    """Reassemble a blob split by ``split_blob`` from its first part and the rest."""
+    if not parts:
+        return blob
+    encoding = blob["encoding"].partition(";parts=")[0]
+    data = b"".join([blob["data"], *(part["data"] for part in parts)])
+    return {**blob, "encoding": encoding, "data": data}
+
+
+def encode_result(result: dict) -> Tuple[dict, dict]:
+    """Compress each artifact list of a result into its own blob.
+
+    Returns the blob records to store, keyed by artifact, and the size
+    accounting that goes into the job metadata.
+    """
+    blobs = {}
+    artifacts = {}
+    for artifact, items in result.items():
+        raw_bytes = len(dumps(items))
+        data = encode_blob(items)
+        blobs[artifact] = {
+            "encoding": BLOB_ENCODING,
+            "items": len(items),
+            "data": data,
+        }
+        artifacts[artifact] = {"raw_bytes": raw_bytes, "stored_bytes": len(data)}
+
+    raw_total = sum(sizes["raw_bytes"] for sizes in artifacts.values())
+    stored_total = sum(sizes["stored_bytes"] for sizes in artifacts.values())
+    storage_stats = {
+        "encoding": BLOB_ENCODING,
+        "raw_bytes": raw_total,
+        "stored_bytes": stored_total,
+        "saved_bytes": raw_total - stored_total,
+        "ratio": round(stored_total / raw_total, 4) if raw_total else 0.0,
+        "artifacts": artifacts,
+    }
+    return blobs, storage_stats
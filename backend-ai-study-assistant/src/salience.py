@@ -0,0 +1,118 @@
+import re
+from collections import Counter
+from typing import List
+
+import numpy as np
+
+TERM_PATTERN = re.compile(r"[^\W\d_]{3,}", re.UNICODE)
+# Table-of-contents entries such as "2.1 Introduction ........ 14"
+TOC_LINE = re.compile(r"(\.{3,}|\s{3,})\s*\d+\s*$|^\s*\d+(\.\d+)*\s+\S.*\s\d+\s*$")
+
+
+def tfidf_matrix(texts: List[str], max_features: int = 4096) -> np.ndarray:
+    """Build an L2-normalized TF-IDF matrix (documents x terms)."""
+    tokenized = [TERM_PATTERN.findall(text.lower()) for text in texts]
+
+    document_frequency = Counter()
+    for terms in tokenized:
+        document_frequency.update(set(terms))
+
+    # Terms found in a single chunk cannot link chunks, so keep shared terms
+    shared = [term for term, df in document_frequency.items() if df > 1]
+    shared.sort(key=lambda term: -document_frequency[term])
+    vocabulary = {term: index for index, term in enumerate(shared[:max_features])}
+    if not vocabulary:
+        return np.zeros((len(texts), 0), dtype=np.float32)
+
+    rows, columns = [], []
+    for row, terms in enumerate(tokenized):
+        indices = [vocabulary[term] for term in terms if term in vocabulary]
+        rows.extend([row] * len(indices))
+        columns.extend(indices)
+
+    shape = (len(texts), len(vocabulary))
+    flat_indices = np.array(rows, dtype=np.intp) * shape[1] + np.array(
+        columns, dtype=np.intp
+    )
+    matrix = (
+        np.bincount(flat_indices, minlength=shape[0] * shape[1])
+        .reshape(shape)
+        .astype(np.float32)
+    )
+
+    document_counts = np.array(
+        [document_frequency[term] for term in vocabulary], dtype=np.float32
+    )
+    idf = np.log((1 + len(texts)) / (1 + document_counts)) + 1
+    matrix = np.log1p(matrix) * idf
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+def textrank(similarity: np.ndarray, damping: float = 0.85, iterations: int = 50):
+    """PageRank over a weighted similarity graph."""
+    count = similarity.shape[0]
+    weights = similarity.copy()
+    np.fill_diagonal(weights, 0)
+
+    out_weight = weights.sum(axis=1, keepdims=True)
+    # Isolated nodes spread their rank uniformly
+    safe_weight = np.where(out_weight == 0, 1, out_weight)
+    transition = np.where(out_weight > 0, weights / safe_weight, 1 / count)
+
+    scores = np.full(count, 1 / count, dtype=np.float64)
+    for _ in range(iterations):
+        updated = (1 - damping) / count + damping * (transition.T @ scores)
+        if np.abs(updated - scores).sum() < 1e-6:
+            return updated
+        scores = updated
+    return scores
+
+
+def boilerplate_penalty(texts: List[str]) -> np.ndarray:
+    """Score in [0, 1] of how much a chunk looks like a TOC, index or license."""
+    penalties = np.zeros(len(texts), dtype=np.float64)
+    for index, text in enumerate(texts):
+        lines = [line for line in text.splitlines() if line.strip()]
+        if not lines:
+            penalties[index] = 1.0
+            continue
+        toc_ratio = sum(1 for line in lines if TOC_LINE.search(line)) / len(lines)
+        letters = sum(character.isalpha() for character in text)
+        letter_ratio = letters / max(1, len(text))
+        penalties[index] = max(toc_ratio, 1 - min(1.0, letter_ratio / 0.6))
+    return penalties
+
+
+def rank_chunks(texts: List[str]) -> np.ndarray:
+    """Salience score per chunk: TextRank centrality damped by boilerplate."""
+    if len(texts) < 2:
+        return np.ones(len(texts))
+
+    matrix = tfidf_matrix(texts)
+    if matrix.shape[1] == 0:
+        return 1 - boilerplate_penalty(texts)
+
+    similarity = matrix @ matrix.T
+    scores = textrank(similarity)
+    return scores * (1 - boilerplate_penalty(texts))
+
+
+def select_salient_chunks(
+    texts: List[str], token_counts: List[int], token_budget: int
+) -> List[int]:
+    """Indices of the most salient chunks that fit the budget, in document order."""
+    scores = rank_chunks(texts)
+    selected = []
+    used = 0
+    for index in np.argsort(-scores, kind="stable"):
+        tokens = token_counts[index]
+        if used + tokens > token_budget:
+            continue
+        selected.append(int(index))
+        used += tokens
+
+    if not selected and texts:
+        selected = [int(np.argmax(scores))]
+    return sorted(selected)
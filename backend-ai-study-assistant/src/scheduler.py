@@ -0,0 +1,134 @@
+import asyncio
+import itertools
+import math
+import time
+from typing import Awaitable, Callable, List, Optional
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Job queue is full")
+        self.retry_after = retry_after
+
+
+class JobScheduler:
+    """Bounded job queue served by a fixed number of workers.
+
+    Jobs are ordered shortest-first by their size (total upload bytes), with
+    submission order breaking ties. Waiting earns a credit of
+    ``aging_rate`` bytes per second, so a large job is not starved by a
+    stream of small ones: it runs once its size minus its credit is the
+    smallest in the queue. Since every queued job earns credit at the same
+    rate, that order is fixed at submit time.
+
+    ``clock`` returns seconds and defaults to ``time.monotonic``.
+    """
+
+    def __init__(
+        self,
+        workers: int = 4,
+        max_queue: int = 32,
+        aging_rate: float = 1024 * 1024,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.aging_rate = max(0.0, aging_rate)
+        self.clock = clock
+        self._epoch = clock()
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.average_duration: Optional[float] = None
+        self._queue: Optional[asyncio.PriorityQueue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._sequence = itertools.count()
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def is_full(self) -> bool:
+        return self.depth >= self.max_queue
+
+    def retry_after(self) -> int:
+        """Estimate in seconds until a queue slot frees up."""
+        average = self.average_duration or 30.0
+        return max(1, math.ceil((self.depth + 1) / self.workers * average))
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self._queue = asyncio.PriorityQueue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(
+        self, job_id: str, size: int, job: Callable[[dict], Awaitable[None]]
+    ) -> None:
+        """Queue a job; it is called with its queue statistics when it starts."""
+        if self._queue is None:
+            raise RuntimeError("JobScheduler has not been started")
+
+        if self.is_full():
+            self.rejected += 1
+            raise QueueFullError(self.retry_after())
+
+        # size - aging_rate * (now - enqueued_at) orders jobs the same as this
+        enqueued_at = self.clock()
+        priority = size + self.aging_rate * (enqueued_at - self._epoch)
+        self._queue.put_nowait(
+            (priority, next(self._sequence), size, job_id, job, enqueued_at, self.depth)
+        )
+
+    async def _worker(self) -> None:
+        while True:
+            _, _, size, job_id, job, enqueued_at, depth = await self._queue.get()
+            queue_stats = {
+                "queue_wait_seconds": round(self.clock() - enqueued_at, 3),
+                "queue_depth_at_submit": depth,
+                "job_size_bytes": size,
+            }
+
+            self.running += 1
+            started_at = self.clock()
+            try:
+                await job(queue_stats)
+                self.completed += 1
+            except Exception as e:
+                self.failed += 1
+                print(f"Scheduled job {job_id} failed: {e}")
+            finally:
+                self.running -= 1
+                self._record_duration(self.clock() - started_at)
+                self._queue.task_done()
+
+    def _record_duration(self, duration: float) -> None:
+        # Exponentially weighted so Retry-After follows recent job durations
+        if self.average_duration is None:
+            self.average_duration = duration
+        else:
+            self.average_duration = 0.8 * self.average_duration + 0.2 * duration
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "queue_depth": self.depth,
+            "max_queue": self.max_queue,
+            "aging_bytes_per_second": self.aging_rate,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "average_duration_seconds": (
+                round(self.average_duration, 3) if self.average_duration else None
+            ),
+        }
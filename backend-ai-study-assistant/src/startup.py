@@ -0,0 +1,113 @@
+import importlib
+import os
+import sys
+import time
+from datetime import datetime
+from typing import Dict
+
+from .metrics import Gauge
+
+
+def process_start_time() -> float:
+    """Wall-clock time this process started, falling back to now.
+
+    On Linux the start tick in /proc/self/stat is compared with
+    /proc/uptime, so interpreter startup counts towards every milestone.
+    """
+    try:
+        with open("/proc/self/stat") as stat_file:
+            # Fields after the command name; the start time is field 22
+            fields = stat_file.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime") as uptime_file:
+            uptime = float(uptime_file.read().split()[0])
+        age = uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+        return time.time() - max(0.0, age)
+    except (OSError, ValueError, IndexError):
+        return time.time()
+
+
+startup_seconds = Gauge(
+    "study_startup_seconds",
+    "Seconds from process start to each startup milestone",
+    ["milestone"],
+)
+import_seconds = Gauge(
+    "study_import_seconds",
+    "Seconds spent on the first import of each lazily loaded module",
+    ["module"],
+)
+
+
+class StartupTimer:
+    """Cold-start milestones and the cost of each deferred import.
+
+    Import times are inclusive: a module pulled in by an earlier lazy
+    import is already loaded and is not listed on its own.
+    """
+
+    def __init__(self, started: float):
+        self.started = started
+        self.milestones: Dict[str, float] = {}
+        self.imports: Dict[str, float] = {}
+
+    def mark(self, milestone: str) -> None:
+        """Record a milestone the first time it is reached."""
+        if milestone not in self.milestones:
+            seconds = round(time.time() - self.started, 4)
+            self.milestones[milestone] = seconds
+            startup_seconds.labels(milestone=milestone).set(seconds)
+
+    def import_module(self, name: str):
+        module = sys.modules.get(name)
+        # A module still being imported by another thread is in sys.modules
+        # half-initialized; import_module waits for that thread instead
+        spec = getattr(module, "__spec__", None)
+        if module is not None and not getattr(spec, "_initializing", False):
+            return module
+
+        started = time.perf_counter()
+        module = importlib.import_module(name)
+        if name not in self.imports:
+            seconds = round(time.perf_counter() - started, 4)
+            self.imports[name] = seconds
+            import_seconds.labels(module=name).set(seconds)
+        return module
+
+    def stats(self) -> dict:
+        return {
+            "process_started_at": datetime.utcfromtimestamp(self.started).isoformat(),
+            "milestones": dict(self.milestones),
+            "imports": dict(self.imports),
+        }
+
+
+STARTUP = StartupTimer(process_start_time())
+
+
+def lazy_import(name: str):
+    """Import a heavy dependency on first use, timing the first load."""
+    return STARTUP.import_module(name)
+
+
+class FirstResponseMiddleware:
+    """ASGI middleware marking when the first HTTP response starts.
+
+    After that it only adds one attribute check per request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.responded = False
+
+    async def __call__(self, scope, receive, send):
+        if self.responded or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_and_mark(message):
+            if message["type"] == "http.response.start" and not self.responded:
+                self.responded = True
+                STARTUP.mark("first_response")
+            await send(message)
+
+        await self.app(scope, receive, send_and_mark)
@@ -0,0 +1,446 @@
+import asyncio
+import os
+import re
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, Optional
+
+from .responses import dumps, loads
+from .startup import lazy_import
+
+# Compressed result blobs are stored under each job document
+RESULTS_SUBCOLLECTION = "results"
+# Most writes a Firestore batch may hold
+FIRESTORE_BATCH_LIMIT = 500
+
+FIELD_NAME_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+
+class JobNotFoundError(KeyError):
+    pass
+
+
+class JobStore(ABC):
+    """Where job documents and their result blobs are persisted.
+
+    A job document is a flat dict keyed by field name (see
+    ``build_initial_document`` in main); result blobs are dicts with
+    ``encoding``, ``items`` and ``data`` keyed by artifact. Methods raise
+    on storage errors and leave logging to the caller.
+    """
+
+    name = "base"
+
+    @abstractmethod
+    async def create(self, doc_data: dict, result_blobs: Optional[dict] = None):
+        """Write a new document and, atomically with it, its result blobs."""
+
+    @abstractmethod
+    async def update(
+        self, doc_uuid: str, update_data: dict, result_blobs: Optional[dict] = None
+    ):
+        """Merge top-level fields into an existing document.
+
+        Raises JobNotFoundError if the document does not exist.
+        """
+
+    @abstractmethod
+    async def put_results(self, doc_uuid: str, result_blobs: dict):
+        """Write blobs on their own, without touching the document."""
+
+    @abstractmethod
+    async def get(self, doc_uuid: str) -> Optional[dict]:
+        """The document, or None if it does not exist."""
+
+    @abstractmethod
+    async def get_results(
+        self, doc_uuid: str, artifacts: List[str]
+    ) -> Dict[str, Optional[dict]]:
+        """Result blobs by artifact; missing blobs map to None."""
+
+    @abstractmethod
+    async def delete(self, doc_uuid: str) -> bool:
+        """Delete a document and its result blobs, returning False if missing."""
+
+    @abstractmethod
+    async def list(
+        self,
+        fields: List[str],
+        status: Optional[str],
+        limit: int,
+        start_after: Optional[dict] = None,
+    ) -> List[dict]:
+        """Documents newest first by (created_at, uuid), projected to ``fields``.
+
+        ``start_after`` holds the created_at and uuid of the last document
+        of the previous page.
+        """
+
+    async def close(self) -> None:
+        pass
+
+
+class FirestoreJobStore(JobStore):
+    """One document per job in a collection, blobs in a subcollection."""
+
+    name = "firestore"
+
+    def __init__(self, client, collection: str):
+        # A single async client is shared by every request so its gRPC channel
+        # is reused and Firestore round trips never block the event loop
+        self.client = client
+        self.collection = collection
+
+    @classmethod
+    def connect(cls, credentials_path: str, collection: str) -> "FirestoreJobStore":
+        # firebase_admin and the gRPC stack are only loaded for this backend
+        firebase_admin = lazy_import("firebase_admin")
+        credentials = lazy_import("firebase_admin.credentials")
+        firestore_async = lazy_import("firebase_admin.firestore_async")
+        if not firebase_admin._apps:
+            cred = credentials.Certificate(credentials_path)
+            firebase_admin.initialize_app(cred)
+        return cls(firestore_async.client(), collection)
+
+    def _document(self, doc_uuid: str):
+        return self.client.collection(self.collection).document(doc_uuid)
+
+    def _result(self, doc_uuid: str, artifact: str):
+        return (
+            self._document(doc_uuid)
+            .collection(RESULTS_SUBCOLLECTION)
+            .document(artifact)
+        )
+
+    def _add_results(self, batch, doc_uuid: str, result_blobs: dict) -> None:
+        for artifact, blob in result_blobs.items():
+            batch.set(self._result(doc_uuid, artifact), blob)
+
+    async def create(self, doc_data: dict, result_blobs: Optional[dict] = None):
+        doc_ref = self._document(doc_data["uuid"])
+        if not result_blobs:
+            await doc_ref.set(doc_data)
+            return
+
+        batch = self.client.batch()
+        batch.set(doc_ref, doc_data)
+        self._add_results(batch, doc_data["uuid"], result_blobs)
+        await batch.commit()
+
+    async def update(
+        self, doc_uuid: str, update_data: dict, result_blobs: Optional[dict] = None
+    ):
+        doc_ref = self._document(doc_uuid)
+        if not result_blobs:
+            await doc_ref.update(update_data)
+            return
+
+        batch = self.client.batch()
+        batch.update(doc_ref, update_data)
+        self._add_results(batch, doc_uuid, result_blobs)
+        await batch.commit()
+
+    async def put_results(self, doc_uuid: str, result_blobs: dict):
+        batch = self.client.batch()
+        self._add_results(batch, doc_uuid, result_blobs)
+        await batch.commit()
+
+    async def get(self, doc_uuid: str) -> Optional[dict]:
+        doc = await self._document(doc_uuid).get()
+        return doc.to_dict() if doc.exists else None
+
+    async def get_results(
+        self, doc_uuid: str, artifacts: List[str]
+    ) -> Dict[str, Optional[dict]]:
+        snapshots = await asyncio.gather(
+            *(self._result(doc_uuid, artifact).get() for artifact in artifacts)
+        )
+        return {
+            artifact: snapshot.to_dict() if snapshot.exists else None
+            for artifact, snapshot in zip(artifacts, snapshots)
+        }
+
+    async def delete(self, doc_uuid: str) -> bool:
+        doc_ref = self._document(doc_uuid)
+        doc = await doc_ref.get()
+
+        if not doc.exists:
+            return False
+
+        # Firestore does not delete subcollections with their parent. Listing
+        # them also finds the file sources, which the document does not name
+        results = doc_ref.collection(RESULTS_SUBCOLLECTION)
+        refs = [ref async for ref in results.list_documents()]
+        refs.append(doc_ref)
+        for start in range(0, len(refs), FIRESTORE_BATCH_LIMIT):
+            batch = self.client.batch()
+            for ref in refs[start : start + FIRESTORE_BATCH_LIMIT]:
+                batch.delete(ref)
+            await batch.commit()
+        return True
+
+    async def list(
+        self,
+        fields: List[str],
+        status: Optional[str],
+        limit: int,
+        start_after: Optional[dict] = None,
+    ) -> List[dict]:
+        base_query = lazy_import("google.cloud.firestore_v1.base_query")
+        descending = base_query.BaseQuery.DESCENDING
+
+        # Served by the composite indexes in firestore.indexes.json
+        query = self.client.collection(self.collection).select(fields)
+
+        if status:
+            query = query.where(filter=base_query.FieldFilter("status", "==", status))
+
+        # uuid breaks ties between jobs created in the same microsecond
+        query = query.order_by("created_at", direction=descending)
+        query = query.order_by("uuid", direction=descending)
+        if start_after:
+            query = query.start_after(start_after)
+        query = query.limit(limit)
+
+        return [doc.to_dict() async for doc in query.stream()]
+
+
+class SQLiteJobStore(JobStore):
+    """Embedded store in a single SQLite database in WAL mode.
+
+    Documents are stored as JSON next to the columns used for filtering and
+    ordering. Every thread gets its own connection: WAL lets readers run
+    alongside the single writer, and writes take the lock up front
+    (BEGIN IMMEDIATE) and wait up to ``busy_timeout`` for other writers,
+    including other processes sharing the file.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str, busy_timeout: float = 5.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        connection = self._connection()
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                uuid TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                document TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_created_at
+                ON jobs (created_at DESC, uuid DESC);
+            CREATE INDEX IF NOT EXISTS jobs_status_created_at
+                ON jobs (status, created_at DESC, uuid DESC);
+            CREATE TABLE IF NOT EXISTS job_results (
+                uuid TEXT NOT NULL,
+                artifact TEXT NOT NULL,
+                encoding TEXT NOT NULL,
+                items INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (uuid, artifact)
+            ) WITHOUT ROWID;
+            """
+        )
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Autocommit mode; transactions are opened explicitly below
+            connection = sqlite3.connect(
+                self.path,
+                timeout=self.busy_timeout,
+                isolation_level=None,
+                check_same_thread=False,
+            )
+            # WAL is durable across crashes at NORMAL; only power loss may
+            # drop the latest commits
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+            with self._connections_lock:
+                self._connections.append(connection)
+        return connection
+
+    @staticmethod
+    def _encode(doc_data: dict) -> str:
+        return dumps(doc_data).decode("utf-8")
+
+    @staticmethod
+    def _insert_results(connection, doc_uuid: str, result_blobs: dict) -> None:
+        connection.executemany(
+            "INSERT OR REPLACE INTO job_results "
+            "(uuid, artifact, encoding, items, data) VALUES (?, ?, ?, ?, ?)",
+            [
+                (doc_uuid, artifact, blob["encoding"], blob["items"], blob["data"])
+                for artifact, blob in result_blobs.items()
+            ],
+        )
+
+    def _write(self, operation, *args):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            result = operation(connection, *args)
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        connection.execute("COMMIT")
+        return result
+
+    def _create(self, connection, doc_data: dict, result_blobs: Optional[dict]):
+        connection.execute(
+            "INSERT OR REPLACE INTO jobs (uuid, status, created_at, document) "
+            "VALUES (?, ?, ?, ?)",
+            (
+                doc_data["uuid"],
+                doc_data["status"],
+                doc_data["created_at"],
+                self._encode(doc_data),
+            ),
+        )
+        if result_blobs:
+            self._insert_results(connection, doc_data["uuid"], result_blobs)
+
+    def _update(
+        self,
+        connection,
+        doc_uuid: str,
+        update_data: dict,
+        result_blobs: Optional[dict],
+    ):
+        row = connection.execute(
+            "SELECT document FROM jobs WHERE uuid = ?", (doc_uuid,)
+        ).fetchone()
+        if row is None:
+            raise JobNotFoundError(doc_uuid)
+
+        doc_data = {**loads(row[0]), **update_data}
+        connection.execute(
+            "UPDATE jobs SET status = ?, document = ? WHERE uuid = ?",
+            (doc_data["status"], self._encode(doc_data), doc_uuid),
+        )
+        if result_blobs:
+            self._insert_results(connection, doc_uuid, result_blobs)
+
+    def _delete(self, connection, doc_uuid: str) -> bool:
+        connection.execute("DELETE FROM job_results WHERE uuid = ?", (doc_uuid,))
+        cursor = connection.execute("DELETE FROM jobs WHERE uuid = ?", (doc_uuid,))
+        return cursor.rowcount > 0
+
+    def _get(self, doc_uuid: str) -> Optional[dict]:
+        row = (
+            self._connection()
+            .execute("SELECT document FROM jobs WHERE uuid = ?", (doc_uuid,))
+            .fetchone()
+        )
+        return loads(row[0]) if row else None
+
+    def _get_results(
+        self, doc_uuid: str, artifacts: List[str]
+    ) -> Dict[str, Optional[dict]]:
+        if not artifacts:
+            return {}
+        # Only the requested blobs are read; file sources can be large
+        placeholders = ", ".join("?" * len(artifacts))
+        rows = (
+            self._connection()
+            .execute(
+                "SELECT artifact, encoding, items, data FROM job_results "
+                f"WHERE uuid = ? AND artifact IN ({placeholders})",
+                (doc_uuid, *artifacts),
+            )
+            .fetchall()
+        )
+        blobs = {
+            artifact: {"encoding": encoding, "items": items, "data": data}
+            for artifact, encoding, items, data in rows
+        }
+        return {artifact: blobs.get(artifact) for artifact in artifacts}
+
+    def _list(
+        self,
+        fields: List[str],
+        status: Optional[str],
+        limit: int,
+        start_after: Optional[dict],
+    ) -> List[dict]:
+        for field in fields:
+            if not FIELD_NAME_PATTERN.match(field):
+                raise ValueError(f"Invalid field name: {field!r}")
+
+        # Only the requested fields leave SQLite, like Firestore's select()
+        projection = ", ".join(
+            f"'{field}', json_extract(document, '$.{field}')" for field in fields
+        )
+        conditions = []
+        params = []
+        if status:
+            conditions.append("status = ?")
+            params.append(status)
+        if start_after:
+            conditions.append("(created_at, uuid) < (?, ?)")
+            params.extend([start_after["created_at"], start_after["uuid"]])
+        where = f"WHERE {' AND '.join(conditions)} " if conditions else ""
+
+        rows = (
+            self._connection()
+            .execute(
+                f"SELECT json_object({projection}) FROM jobs {where}"
+                "ORDER BY created_at DESC, uuid DESC LIMIT ?",
+                (*params, limit),
+            )
+            .fetchall()
+        )
+        return [loads(row[0]) for row in rows]
+
+    async def create(self, doc_data: dict, result_blobs: Optional[dict] = None):
+        await asyncio.to_thread(self._write, self._create, doc_data, result_blobs)
+
+    async def update(
+        self, doc_uuid: str, update_data: dict, result_blobs: Optional[dict] = None
+    ):
+        await asyncio.to_thread(
+            self._write, self._update, doc_uuid, update_data, result_blobs
+        )
+
+    async def put_results(self, doc_uuid: str, result_blobs: dict):
+        await asyncio.to_thread(
+            self._write, self._insert_results, doc_uuid, result_blobs
+        )
+
+    async def get(self, doc_uuid: str) -> Optional[dict]:
+        return await asyncio.to_thread(self._get, doc_uuid)
+
+    async def get_results(
+        self, doc_uuid: str, artifacts: List[str]
+    ) -> Dict[str, Optional[dict]]:
+        return await asyncio.to_thread(self._get_results, doc_uuid, artifacts)
+
+    async def delete(self, doc_uuid: str) -> bool:
+        return await asyncio.to_thread(self._write, self._delete, doc_uuid)
+
+    async def list(
+        self,
+        fields: List[str],
+        status: Optional[str],
+        limit: int,
+        start_after: Optional[dict] = None,
+    ) -> List[dict]:
+        return await asyncio.to_thread(self._list, fields, status, limit, start_after)
+
+    async def close(self) -> None:
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for connection in connections:
+            connection.close()
@@ -0,0 +1,115 @@
+import json
+import re
+from typing import Callable, Dict, List
+
+
+class IncrementalArrayParser:
+    """Parses the objects of a JSON array out of a token stream.
+
+    Text is fed as it arrives; every object in the array stored under ``key``
+    is returned from ``feed`` as soon as its closing brace is seen.
+    Anything before the array (prose, reasoning, code fences) is skipped.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.done = False
+        self._array_start = re.compile(r'"' + re.escape(key) + r'"\s*:\s*\[')
+        self._buffer = ""
+        self._in_array = False
+        self._position = 0
+        self._depth = 0
+        self._object_start = None
+        self._in_string = False
+        self._escaped = False
+
+    def feed(self, text: str) -> List[dict]:
+        if self.done:
+            return []
+
+        self._buffer += text
+        if not self._in_array:
+            match = self._array_start.search(self._buffer)
+            if match is None:
+                # Keep only a tail long enough to hold a split array header
+                self._buffer = self._buffer[-(len(self.key) + 64) :]
+                return []
+            self._in_array = True
+            self._buffer = self._buffer[match.end() :]
+            self._position = 0
+
+        items = []
+        buffer = self._buffer
+        position = self._position
+        while position < len(buffer):
+            character = buffer[position]
+
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif character == "\\":
+                    self._escaped = True
+                elif character == '"':
+                    self._in_string = False
+            elif character == '"':
+                self._in_string = True
+            elif character in "{[":
+                if self._depth == 0 and character == "{":
+                    self._object_start = position
+                self._depth += 1
+            elif character in "}]":
+                if self._depth == 0 and character == "]":
+                    self.done = True
+                    break
+                self._depth -= 1
+                if self._depth == 0 and self._object_start is not None:
+                    raw = buffer[self._object_start : position + 1]
+                    try:
+                        items.append(json.loads(raw))
+                    except ValueError:
+                        pass
+                    self._object_start = None
+
+            position += 1
+
+        # Drop everything before the object currently being read
+        keep_from = self._object_start if self._object_start is not None else position
+        self._buffer = buffer[keep_from:]
+        self._position = position - keep_from
+        if self._object_start is not None:
+            self._object_start = 0
+        return items
+
+
+class StreamedItems:
+    """Reports the items of a streamed reply as soon as they are complete.
+
+    ``models`` maps each array key to the model an item is validated with;
+    invalid items are skipped. ``restart`` is called before every attempt
+    of a request: the parsers start over, and items a failed attempt
+    already reported are skipped, so a retried reply only reports the
+    items past them.
+    """
+
+    def __init__(self, models: Dict[str, Callable], on_item: Callable):
+        self.models = models
+        self.on_item = on_item
+        self.reported = dict.fromkeys(models, 0)
+        self.restart()
+
+    def restart(self) -> None:
+        self.parsers = {key: IncrementalArrayParser(key) for key in self.models}
+        self.seen = dict.fromkeys(self.models, 0)
+
+    def __call__(self, text: str) -> None:
+        for key, parser in self.parsers.items():
+            for raw_item in parser.feed(text):
+                try:
+                    item = self.models[key](**raw_item)
+                except Exception:
+                    # Invalid items are reported by the final parse
+                    continue
+                self.seen[key] += 1
+                if self.seen[key] > self.reported[key]:
+                    self.reported[key] += 1
+                    self.on_item(key, item)
@@ -0,0 +1,103 @@
+import asyncio
+import hashlib
+import os
+import tempfile
+from typing import List, Optional, Set
+
+import aiofiles
+from fastapi import UploadFile
+
+
+class UploadSpooler:
+    """Copies uploaded files to temporary files in fixed-size chunks.
+
+    By the time a handler runs, Starlette has already parsed the multipart
+    body into its own spooled temporary files (in memory up to 1 MiB per
+    file, then on disk). What this bounds is the copy: every chunk in
+    flight holds a slot of a shared semaphore, so this copy's buffers never
+    exceed ``memory_budget`` bytes however many uploads run at once. The
+    files are kept until the job that owns them ends, and files still
+    waiting in the job queue are removed by ``cleanup_pending``.
+    """
+
+    def __init__(
+        self,
+        directory: Optional[str] = None,
+        chunk_size: int = 1024 * 1024,
+        memory_budget: int = 64 * 1024 * 1024,
+    ):
+        self.directory = directory
+        self.chunk_size = max(1, chunk_size)
+        self._buffer_slots = asyncio.Semaphore(max(1, memory_budget // self.chunk_size))
+        # Spooled files not yet cleaned up, so shutdown can remove them
+        self.pending: Set[str] = set()
+
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    async def spool(self, upload: UploadFile) -> dict:
+        """Write an upload to disk, hashing and measuring it on the fly."""
+        fd, path = tempfile.mkstemp(suffix=".pdf", dir=self.directory)
+        os.close(fd)
+        self.pending.add(path)
+
+        sha256 = hashlib.sha256()
+        size = 0
+
+        try:
+            async with aiofiles.open(path, "wb") as spool_file:
+                while True:
+                    async with self._buffer_slots:
+                        chunk = await upload.read(self.chunk_size)
+                        if not chunk:
+                            break
+                        sha256.update(chunk)
+                        size += len(chunk)
+                        await spool_file.write(chunk)
+        except Exception:
+            self.cleanup([{"path": path}])
+            raise
+        finally:
+            await upload.close()
+
+        return {
+            "filename": upload.filename,
+            "content_type": upload.content_type,
+            "path": path,
+            "size": size,
+            "sha256": sha256.hexdigest(),
+        }
+
+    async def spool_all(self, uploads: List[UploadFile]) -> List[dict]:
+        """Spool several uploads, removing any partial output on failure."""
+        files_data = []
+        try:
+            for upload in uploads:
+                files_data.append(await self.spool(upload))
+        except Exception:
+            self.cleanup(files_data)
+            raise
+        return files_data
+
+    def cleanup(self, files_data: List[dict]) -> None:
+        """Delete the temporary files backing a job.
+
+        Files kept from an earlier run of the job have no upload to delete.
+        """
+        for file_data in files_data:
+            if "path" in file_data:
+                self._remove(file_data["path"])
+
+    def cleanup_pending(self) -> None:
+        """Delete every spooled file not cleaned up yet, e.g. of queued jobs."""
+        for path in list(self.pending):
+            self._remove(path)
+
+    def _remove(self, path: str) -> None:
+        self.pending.discard(path)
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Error removing spooled upload {path}: {e}")
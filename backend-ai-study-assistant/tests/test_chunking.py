@@ -0,0 +1,131 @@
+import math
+import sys
+import types
+
+import pytest
+
+from src.chunking import TokenChunker, TokenCounter
+
+
+class OfflineError(Exception):
+    pass
+
+
+@pytest.fixture
+def offline_tiktoken(monkeypatch):
+    """A tiktoken whose encodings cannot be downloaded."""
+    attempts = []
+
+    def fail(name):
+        attempts.append(name)
+        raise OfflineError("no network")
+
+    module = types.ModuleType("tiktoken")
+    module.encoding_for_model = fail
+    module.get_encoding = fail
+    monkeypatch.setitem(sys.modules, "tiktoken", module)
+    return attempts
+
+
+@pytest.fixture
+def counter(offline_tiktoken):
+    # Counts fall back to one token per four characters
+    return TokenCounter("openai/gpt-4o-mini")
+
+
+def words(count, start=0):
+    return " ".join(f"w{index:03d}" for index in range(start, start + count))
+
+
+def paragraphs(count, length=12):
+    return "\n\n".join(words(length, index * length) + "." for index in range(count))
+
+
+def test_offline_encoding_falls_back_to_estimates(offline_tiktoken, counter):
+    assert counter.count("abcdefgh") == 2
+    assert counter.count("abcdefghi") == 3
+    assert counter.count("") == 0
+    # Resolved once: the model, then the default encoding, never retried
+    assert offline_tiktoken == ["gpt-4o-mini", "o200k_base"]
+
+
+def test_counts_are_cached_by_digest(counter):
+    text = "x" * 100_000
+
+    assert counter.count(text) == 25_000
+    assert counter.count(text) == 25_000
+    assert counter.cache_info() == {"hits": 1, "misses": 1, "size": 1}
+    assert all(len(key) < 64 for key in counter._counts._entries)
+
+
+def test_chunks_fit_the_budget(counter):
+    chunker = TokenChunker(counter, max_tokens=50, overlap_tokens=0)
+
+    chunks = chunker.split_with_counts(paragraphs(20))
+
+    assert len(chunks) > 1
+    for chunk, tokens in chunks:
+        assert tokens <= 50
+        assert counter.count(chunk) <= tokens
+
+
+def test_no_text_is_lost_without_overlap(counter):
+    text = paragraphs(20)
+    chunker = TokenChunker(counter, max_tokens=50, overlap_tokens=0)
+
+    chunks = chunker.split_text(text)
+
+    assert "\n\n".join(chunks) == text
+
+
+def test_overlap_repeats_the_last_segments(counter):
+    chunker = TokenChunker(counter, max_tokens=50, overlap_tokens=20)
+
+    chunks = chunker.split_text(paragraphs(20))
+
+    for previous, chunk in zip(chunks, chunks[1:]):
+        carried = previous.split("\n\n")[-1]
+        assert chunk.startswith(carried)
+        assert counter.count(carried) + TokenChunker.SEPARATOR_TOKENS <= 20
+
+
+def test_overlap_is_capped_at_half_the_budget(counter):
+    chunker = TokenChunker(counter, max_tokens=40, overlap_tokens=100)
+
+    assert chunker.overlap_tokens == 20
+
+
+def test_oversized_sentences_are_split_on_words(counter):
+    sentence = words(200)
+    chunker = TokenChunker(counter, max_tokens=30, overlap_tokens=0)
+
+    chunks = chunker.split_with_counts(sentence)
+
+    assert all(tokens <= 30 for _, tokens in chunks)
+    assert " ".join(chunk for chunk, _ in chunks).split() == sentence.split()
+
+
+@pytest.mark.parametrize("piece_size", [1, 7, 50, 10_000])
+def test_stream_matches_splitting_the_whole_text(counter, piece_size):
+    text = paragraphs(15) + "\n\n \n\n" + words(90) + "\n\n" + paragraphs(3)
+    chunker = TokenChunker(counter, max_tokens=40, overlap_tokens=12)
+
+    stream = chunker.stream()
+    streamed = []
+    for start in range(0, len(text), piece_size):
+        streamed.extend(stream.feed(text[start : start + piece_size]))
+    streamed.extend(stream.finish())
+
+    assert streamed == chunker.split_with_counts(text)
+
+
+def test_stream_keeps_a_paragraph_break_split_between_pieces(counter):
+    chunker = TokenChunker(counter, max_tokens=1000, overlap_tokens=0)
+    stream = chunker.stream()
+
+    chunks = stream.feed("first page text\n") + stream.feed("\nsecond page text")
+    chunks += stream.finish()
+
+    assert chunks == [
+        ("first page text\n\nsecond page text", math.ceil(15 / 4) + 1 + 5)
+    ]
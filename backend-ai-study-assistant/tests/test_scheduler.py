@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+from src.scheduler import JobScheduler, QueueFullError
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+async def settle():
+    # Let the workers pick up whatever they can
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def recorder(log, name, gate=None):
+    async def job(queue_stats):
+        log.append((name, queue_stats))
+        if gate is not None:
+            await gate.wait()
+
+    return job
+
+
+def run_order(aging_rate):
+    """Order in which jobs run when a big one waits behind a stream of small ones."""
+
+    async def scenario():
+        clock = FakeClock()
+        scheduler = JobScheduler(
+            workers=1, max_queue=200, aging_rate=aging_rate, clock=clock
+        )
+        scheduler.start()
+        log = []
+        gate = asyncio.Event()
+        scheduler.submit("blocker", 1, recorder(log, "blocker", gate))
+        await settle()
+
+        scheduler.submit("large", 1000, recorder(log, "large"))
+        for second in range(10, 2000, 10):
+            clock.now = second
+            scheduler.submit(f"small-{second}", 10, recorder(log, f"small-{second}"))
+
+        gate.set()
+        await scheduler._queue.join()
+        await scheduler.stop()
+        return [name for name, _ in log], dict(log)
+
+    return asyncio.run(scenario())
+
+
+def test_large_job_overtakes_later_small_jobs():
+    order, stats = run_order(aging_rate=1.0)
+
+    # At one byte per second, the 1000 byte job beats small jobs submitted
+    # more than 990 seconds after it
+    position = order.index("large")
+    assert order[position - 1] == "small-980"
+    assert order[position + 1] == "small-990"
+    assert stats["large"]["job_size_bytes"] == 1000
+    assert stats["large"]["queue_depth_at_submit"] == 0
+    assert stats["small-1990"]["queue_wait_seconds"] == 0
+    assert stats["small-10"]["queue_depth_at_submit"] == 1
+
+
+def test_without_aging_small_jobs_always_go_first():
+    order, _ = run_order(aging_rate=0.0)
+
+    assert order[-1] == "large"
+    assert order[1:-1] == [f"small-{second}" for second in range(10, 2000, 10)]
+
+
+def test_capacity_limits_are_respected():
+    async def scenario():
+        scheduler = JobScheduler(workers=2, max_queue=3, clock=FakeClock())
+        scheduler.start()
+        gate = asyncio.Event()
+        active = []
+        peak = 0
+
+        async def job(queue_stats):
+            nonlocal peak
+            active.append(queue_stats)
+            peak = max(peak, len(active))
+            await gate.wait()
+            active.pop()
+
+        for index in range(5):
+            scheduler.submit(f"job-{index}", 1, job)
+            await settle()
+
+        assert scheduler.running == 2
+        assert scheduler.depth == 3
+        assert scheduler.is_full()
+        with pytest.raises(QueueFullError) as error:
+            scheduler.submit("job-5", 1, job)
+        assert error.value.retry_after >= 1
+        assert scheduler.rejected == 1
+
+        gate.set()
+        await scheduler._queue.join()
+        await scheduler.stop()
+        return scheduler, peak
+
+    scheduler, peak = asyncio.run(scenario())
+
+    assert peak == 2
+    assert scheduler.completed == 5
+    assert scheduler.stats()["queue_depth"] == 0
+
+
+def test_failed_jobs_free_their_worker():
+    async def scenario():
+        scheduler = JobScheduler(workers=1, max_queue=4, clock=FakeClock())
+        scheduler.start()
+        log = []
+
+        async def broken(queue_stats):
+            raise RuntimeError("boom")
+
+        scheduler.submit("broken", 1, broken)
+        scheduler.submit("next", 1, recorder(log, "next"))
+        await scheduler._queue.join()
+        await scheduler.stop()
+        return scheduler, log
+
+    scheduler, log = asyncio.run(scenario())
+
+    assert [name for name, _ in log] == ["next"]
+    assert (scheduler.failed, scheduler.completed, scheduler.running) == (1, 1, 0)
@@ -0,0 +1,105 @@
+import json
+
+from src.streaming_json import IncrementalArrayParser, StreamedItems
+
+
+def feed_in_pieces(parser, text, size):
+    items = []
+    for start in range(0, len(text), size):
+        items.extend(parser.feed(text[start : start + size]))
+    return items
+
+
+def test_items_are_returned_as_they_complete():
+    parser = IncrementalArrayParser("cards")
+
+    assert parser.feed('Sure! {"cards": [{"q": "a"}, {"q"') == [{"q": "a"}]
+    assert parser.feed(': "b"}]}') == [{"q": "b"}]
+    assert parser.done
+
+
+def test_array_header_split_across_pieces():
+    parser = IncrementalArrayParser("cards")
+    text = "thinking... " * 50 + '{"cards": [{"q": "a"}]}'
+
+    assert feed_in_pieces(parser, text, 3) == [{"q": "a"}]
+
+
+def test_escape_sequence_split_between_pieces():
+    parser = IncrementalArrayParser("cards")
+    item = {"q": 'say "hi" \\ {not a brace}', "a": "é"}
+    text = json.dumps({"cards": [item, {"q": "next"}]})
+
+    # One character at a time splits every escape after its backslash
+    assert feed_in_pieces(parser, text, 1) == [item, {"q": "next"}]
+
+
+def test_braces_and_brackets_inside_strings():
+    parser = IncrementalArrayParser("cards")
+    item = {"q": "f(x) = {1, 2}] and [3", "nested": {"list": [{"a": 1}]}}
+    text = json.dumps({"cards": [item]})
+
+    assert feed_in_pieces(parser, text, 7) == [item]
+    assert parser.done
+
+
+def test_truncated_final_object_is_not_returned():
+    parser = IncrementalArrayParser("cards")
+
+    items = parser.feed('{"cards": [{"q": "a"}, {"q": "b", "a": "unfini')
+
+    assert items == [{"q": "a"}]
+    assert not parser.done
+    assert parser.feed("") == []
+
+
+def test_text_after_the_array_is_ignored():
+    parser = IncrementalArrayParser("cards")
+
+    assert parser.feed('{"cards": [{"q": "a"}], "more": [{"q": "b"}]}') == [{"q": "a"}]
+    assert parser.feed('{"cards": [{"q": "c"}]}') == []
+
+
+def make_streamed(models=None):
+    reported = []
+    streamed = StreamedItems(
+        models or {"cards": dict}, lambda key, item: reported.append((key, item))
+    )
+    return streamed, reported
+
+
+def test_restart_does_not_report_items_twice():
+    streamed, reported = make_streamed()
+
+    # The first attempt fails mid-object, the retry sends the whole reply
+    streamed('{"cards": [{"q": "a"}, {"q": "b"}, {"q": "c", "a": "tru')
+    streamed.restart()
+    streamed('{"cards": [{"q": "a2"}, {"q": "b2"}, {"q": "c2"}]}')
+
+    assert reported == [
+        ("cards", {"q": "a"}),
+        ("cards", {"q": "b"}),
+        ("cards", {"q": "c2"}),
+    ]
+
+
+def test_restart_drops_the_partial_object():
+    streamed, reported = make_streamed()
+
+    streamed('{"cards": [{"q": "half')
+    streamed.restart()
+    streamed('{"cards": [{"q": "whole"}]}')
+
+    assert reported == [("cards", {"q": "whole"})]
+
+
+def test_invalid_items_are_skipped_per_key():
+    def card(q):
+        if not q:
+            raise ValueError("empty question")
+        return {"q": q}
+
+    streamed, reported = make_streamed({"cards": card, "points": dict})
+    streamed('{"cards": [{"q": ""}, {"q": "ok"}], "points": [{"p": 1}]}')
+
+    assert reported == [("cards", {"q": "ok"}), ("points", {"p": 1})]
@@ -19,28 +19,67 @@ export default function Summary() {
       return;
     }
 
-    const interval = setInterval(async () => {
-      try {
-        const res = await fetch(`http://localhost:8000/status/${uuid}`);
-        const json = await res.json();
+    let interval = null;
+    let source = null;
 
-        if (json.status === "finished") {
-          setData(json.result);
-          clearInterval(interval);
-          setLoading(false);
-        } else if (json.status === "error") {
-          setError("Hubo un problema procesando el archivo.");
+    // Devuelve true cuando el procesamiento terminó (con éxito o con error)
+    const handleStatus = (json) => {
+      if (json.status === "finished") {
+        setData(json.result);
+        setLoading(false);
+        return true;
+      }
+      if (json.status === "error") {
+        setError("Hubo un problema procesando el archivo.");
+        setLoading(false);
+        return true;
+      }
+      // Muestra los elementos generados hasta ahora mientras sigue el proceso
+      if (json.partial_result) {
+        setData(json.partial_result);
+      }
+      return false;
+    };
+
+    const startPolling = () => {
+      interval = setInterval(async () => {
+        try {
+          const res = await fetch(`http://localhost:8000/status/${uuid}`);
+          const json = await res.json();
+
+          if (handleStatus(json)) {
+            clearInterval(interval);
+          }
+        } catch (err) {
+          setError("Error al conectar con el servidor.");
           clearInterval(interval);
           setLoading(false);
         }
-      } catch (err) {
-        setError("Error al conectar con el servidor.");
-        clearInterval(interval);
-        setLoading(false);
-      }
-    }, 2000);
+      }, 2000);
+    };
+
+    if (window.EventSource) {
+      // El servidor envía cada cambio de etapa; no hace falta consultar cada 2 s
+      source = new EventSource(`http://localhost:8000/status/${uuid}/events`);
+      source.onmessage = (event) => {
+        if (handleStatus(JSON.parse(event.data))) {
+          source.close();
+        }
+      };
+      source.onerror = () => {
+        // EventSource reconecta solo; si se rinde, volvemos a consultar
+        if (source.readyState === EventSource.CLOSED) {
+          startPolling();
+        }
+      };
+    } else {
+      startPolling();
+    }
 
-    return () => clearInterval(interval);
+    return () => {
+      if (source) source.close();
+      clearInterval(interval);
+    };
   }, [uuid]);
 
   const toggleExpand = (i) => {
@@ -61,7 +100,7 @@ export default function Summary() {
     doc.save("resumen_ai_study_assistant.pdf");
   };
 
-  if (loading) {
+  if (loading && !data) {
     return (
       <div className="text-center py-8 text-blue-600 font-medium">
         ⏳ Procesando tu resumen... por favor espera.
@@ -81,6 +120,11 @@ export default function Summary() {
 
   return (
     <section className="max-w-4xl mx-auto space-y-12 mt-6">
+      {loading && (
+        <div className="text-center text-blue-600 font-medium">
+          ⏳ Generando más contenido... los resultados se actualizan solos.
+        </div>
+      )}
       {/* Resumen */}
       <div className="bg-white p-6 rounded-xl shadow-md relative">
         <div className="flex items-center justify-between mb-4">
@@ -42,16 +42,17 @@ export async function deleteSummary(uuid) {
   return await response.text();
 }
 
-// Listar resúmenes (opcional: status_filter)
-export async function listSummaries(limit = 50, status_filter = null) {
+// Listar resúmenes (opcional: status_filter, cursor = next_cursor de la página anterior)
+export async function listSummaries(limit = 50, status_filter = null, cursor = null) {
   const url = new URL(`${BASE_URL}/summaries`);
   url.searchParams.append("limit", limit);
   if (status_filter) url.searchParams.append("status_filter", status_filter);
+  if (cursor) url.searchParams.append("cursor", cursor);
 
   const response = await fetch(url);
   if (!response.ok) {
     throw new Error("Error al listar los resúmenes.");
   }
 
-  return await response.json();
+  return await response.json(); // { summaries, total_returned, next_cursor, filters_applied }
 }
\ No newline at end of file